@@ -10,28 +10,31 @@ from bubbler import bubblers, Potential
 from quartic_from_files import RC_PARAMS
 
 
-# Make potentials
+# Make potentials; parameters stay symbolic so the setup is shared by all points
+
+THIN_WALL = "lambda_ / 8 * (x^2 - a^2)^2 + 1/2 * epsilon / a * (x - a)"
+LOGARITHMIC = "1/2 * mass^2 * x^2 * (1 - log(x^2 / omega^2))"
+FUBINI = "4 * u * m^2 * (m - 1) / (2 * m + 1) * x^(2 + 1 / m) - 2 * u * v * m^2 * x^(2 + 2 / m)"
 
 def thin_wall(lambda_, a, epsilon):
 
-    thin_wall_str = "{lambda_} / 8 * (x^2 - {a}^2)^2 + 1/2 * {epsilon} / {a} * (x - {a})"
-    p = Potential(thin_wall_str.format(lambda_=lambda_, epsilon=epsilon, a=a), true_vacuum=-a, false_vacuum=a)
+    p = Potential(THIN_WALL, true_vacuum=-a, false_vacuum=a,
+                  parameters={"lambda_": lambda_, "a": a, "epsilon": epsilon})
     S = 16. * np.pi**2 * a**12 * lambda_**2 / (6. * epsilon**3)
     return (p, S)
 
 def logarithmic(mass, omega):
 
-    logarithmic_str = "1/2 * {mass}^2 * x^2 * (1 - log(x^2 / {omega}^2))"
-    p = Potential(logarithmic_str.format(mass=mass, omega=omega),
-                  true_vacuum=10. * omega, false_vacuum=1e-3 * omega, polish=False)
+    p = Potential(LOGARITHMIC, true_vacuum=10. * omega, false_vacuum=1e-3 * omega, polish=False,
+                  parameters={"mass": mass, "omega": omega})
     S = 0.5 * np.pi**2 * np.exp(4.) * omega**2 / mass**2
     return (p, S)
 
 def fubini(u, v, m):
 
-    fubini_str = "4 * {u} * {m}^2 * ({m} - 1) / (2 * {m} + 1) * x^(2 + 1 / {m}) - 2 * {u} * {v} * {m}^2 * x^(2 + 2 / {m})"
     zero = 2**m / (m**2 * u * v)**m * (((m - 1) * m**2 * u) / (1 + 2 * m))**m
-    p = Potential(fubini_str.format(u=u, v=v, m=m), true_vacuum=10. * zero, false_vacuum=0., polish=False)
+    p = Potential(FUBINI, true_vacuum=10. * zero, false_vacuum=0., polish=False,
+                  parameters={"u": u, "v": v, "m": m})
     S = m * np.pi**2 / ((4. * m**2 - 1.) * u * v**(2 * m - 1))
     return (p, S)
 
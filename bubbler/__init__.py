@@ -1,2 +1,6 @@
-from bubbler import bubbler, bubblers, profiles, one_dim_bubblers, one_dim_profiles
+from bubbler import bubbler, bubblers, race, batch_bubbler, scan, iscan, profiles, one_dim_bubblers, one_dim_profiles
 from potential import Potential, one_dim_potential
+from cache import Cache
+from trajectory import Trajectory
+from store import ScanStore
+from adaptive import adaptive_scan
@@ -0,0 +1,140 @@
+"""
+Adaptive scans in one parameter
+===============================
+
+Start from a coarse grid and bisect only the intervals that are not yet good
+enough: where linear interpolation of the logarithm of the action from a code
+misses by more than a tolerance, or where the relative difference between the
+codes or, if given, from a reference, such as a thin-wall approximation, is
+larger than the tolerance at either end. Intervals at which a code starts or
+stops failing are bisected as well.
+
+>>> from bubbler import one_dim_potential
+>>> def thin_wall(alpha):
+...     return 4. * np.pi / (81. * (alpha - 0.5)**2)
+>>> alphas, results = adaptive_scan(one_dim_potential, (0.501, 0.75), fixed=(1.,),
+...                                 backends=["cosmotransitions"], reference=thin_wall)
+"""
+
+import numpy as np
+
+from bubbler import BACKENDS, iscan
+
+
+def _misses(x, y):
+    """
+    :returns: How much linear interpolation between neighbours misses each
+    interior point, NaN where a value is missing
+    :rtype: array
+    """
+    weight = (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+    guess = y[:-2] + weight * (y[2:] - y[:-2])
+    return np.abs(y[1:-1] - guess)
+
+def _interval_errors(x, curves, gaps=()):
+    """
+    :param x: Sorted points
+    :param curves: Values at the points of each curve to interpolate
+    :param gaps: Values at the points of each difference to keep small
+    :returns: Estimate of error in each interval between points
+    :rtype: array
+    """
+    errors = np.zeros(len(x) - 1)
+
+    # Bisect where a curve starts or stops being defined
+
+    for y in list(curves) + list(gaps):
+        finite = np.isfinite(y)
+        errors[finite[1:] != finite[:-1]] = np.inf
+
+    # Differences are as bad as they are at the worse end of an interval
+
+    for y in gaps:
+        size = np.nan_to_num(np.abs(y))
+        errors = np.maximum(errors, np.maximum(size[1:], size[:-1]))
+
+    for y in curves:
+
+        if len(x) < 3:
+            continue
+
+        miss = np.nan_to_num(_misses(x, y))
+        errors[:-1] = np.maximum(errors[:-1], miss)
+        errors[1:] = np.maximum(errors[1:], miss)
+
+    return errors
+
+def _curves(x, results, backends, reference):
+    """
+    :returns: Curves that should be resolved, and differences between codes
+    and from the reference that should be small
+    :rtype: tuple
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+
+        actions = [np.array([r[b].action for r in results], dtype=float) for b in backends]
+        curves = [np.log(np.where(a > 0., a, np.nan)) for a in actions]
+        gaps = [(other - actions[0]) / np.abs(actions[0]) for other in actions[1:]]
+
+        if reference is not None:
+            expected = np.array([reference(p) for p in x], dtype=float)
+            gaps += [(a - expected) / np.abs(expected) for a in actions]
+
+    return curves, gaps
+
+def adaptive_scan(potentials, bounds, fixed=(), backends=None, n_start=17,
+                  tol=1E-2, max_points=500, min_width=None, reference=None,
+                  processes=None, options=None, **kwargs):
+    """
+    :param potentials: Factory of potentials
+    :param bounds: Smallest and largest value of scanned parameter
+    :param fixed: Parameters passed to the factory before the scanned one
+    :param backends: Codes with which to solve bounce
+    :param n_start: Number of points in starting grid
+    :param tol: Tolerance for linear interpolation of logarithm of action,
+    and for relative differences between codes and from the reference
+    :param max_points: Maximum number of points
+    :param min_width: Width of intervals that are not bisected further
+    :param reference: Function of scanned parameter to compare actions with
+    :param processes: Number of worker processes, by default the number of cores
+    :param options: Extra settings for particular codes
+    :returns: Points and results from all codes for each point, in order
+    :rtype: tuple
+    """
+    backends = backends if backends else BACKENDS
+    fixed = tuple(fixed)
+    low, high = bounds
+    min_width = min_width if min_width is not None else (high - low) * 1E-6
+
+    x = np.array([])
+    results = []
+    todo = np.linspace(low, high, min(n_start, max_points))
+
+    while len(todo):
+
+        # Solve new points on a pool of processes
+
+        grid = [fixed + (p,) for p in todo]
+        solved = dict(iscan(potentials, backends, grid, processes, options, **kwargs))
+
+        x = np.concatenate((x, todo))
+        results += [solved[i] for i in range(len(todo))]
+
+        order = np.argsort(x)
+        x = x[order]
+        results = [results[i] for i in order]
+
+        # Bisect worst unresolved intervals, while there are points to spare
+
+        errors = _interval_errors(x, *_curves(x, results, backends, reference))
+        errors[np.diff(x) <= min_width] = 0.
+        worst = np.argsort(errors)[::-1]
+        worst = worst[errors[worst] > tol][:max_points - len(x)]
+
+        todo = 0.5 * (x[worst] + x[worst + 1])
+
+    return x, results
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -5,86 +5,170 @@ Interface to AnyBubble
 >>> ginac_potential = "0.1*((-x + 2)^4 - 14*(-x + 2)^2 + 24*(-x + 2))"
 >>> from potential import Potential
 >>> print solve(Potential(ginac_potential))
+
+Keep one kernel, with AnyBubble loaded, for all solves:
+
+>>> print solve(Potential(ginac_potential), persistent=True)
+
+The kernel is started by $ANYBUBBLE_KERNEL, by default "math -noprompt". Each
+request is one line of input; the kernel answers with rows of rho and fields,
+the action and time, and a line "end", or with "error" and "end". Output is
+never wrapped, so that long rows of many fields stay on one line.
 """
 
 import os
-import tempfile
-import numpy as np
-from subprocess32 import check_output
+import shlex
+
+from estimate import scales
+from process import run, TimedOut
+from results import read_result
+from session import Session, session, END
+from workspace import scratch
 
 
+SOLVE = ('{{time, sol}} = Quiet[Timing[FindBubble[ToExpression["{0}"], q, {1}, {2}, '
+         'SpaceTimeDimension -> {3}, PowellVerbosity -> 0, Verbose -> False]]]; '
+         'If[NumericQ[sol[[1]]], '
+         'R = Subdivide[0, {4}, {5}] // N; '
+         'traj = MapThread[Prepend, {{Map[sol[[2]], R], R}}]; '
+         'Print[ExportString[traj, "Table"]]; '
+         'Print[CForm[sol[[1]]], " ", CForm[time]], '
+         'Print["error FindBubble failed"]];')
+
+RHO_END = 100.
+N_RHO = 1000
+
 SCRIPT = """
 #!/usr/bin/env wolframscript
 SetDirectory["{0}"]
+SetOptions[$Output, PageWidth -> Infinity];
 << anybubble`
-potential = ToExpression["{1}"];
-{{time, sol}} = Timing[FindBubble[potential, q, {2}, {3}, SpaceTimeDimension -> {4}, PowellVerbosity -> 0, Verbose -> False]];
-action = sol[[1]];
-R = Subdivide[0, 100, 1000] // N;
-fields = Map[sol[[2]], R];
-traj = MapThread[Append, {{fields, R}}];
-Export["{5}/traj.txt", traj, "Table"];
-Export["{5}/action.txt", action // CForm];
-Export["{5}/time.txt", time // CForm];
+{1}
 Quit[];
 """
 
+SETUP = ('SetDirectory["{0}"]; SetOptions[$Output, PageWidth -> Infinity]; '
+         'Get["anybubble`"]; Print["{1}"];\n')
+
+REQUEST = '{0} Print["{1}"];\n'
+
+
 def curly(array):
     """
     :returns: Array as a Mathematica string
     """
     return str(array.tolist()).replace('[', '{').replace(']', '}')
 
-def solve(potential, output=None, dim=3, **kwargs):
+def solve_code(potential, dim=3):
+    """
+    :returns: One line of Mathematica that solves this problem and prints the
+    rows of rho and fields, then the action and time taken
+
+    The profile is sampled on a domain and grid from estimated scales of the
+    bubble.
+    """
+    estimated = scales(potential, dim)
+    rho_end = estimated.domain if estimated else RHO_END
+    n_rho = estimated.points() if estimated else N_RHO
+
+    return SOLVE.format(potential.mathematica_potential,
+                        curly(potential.true_vacuum),
+                        curly(potential.false_vacuum),
+                        dim,
+                        repr(float(rho_end)),
+                        n_rho)
+
+def parse(output):
     """
     :returns: Action, trajectory of bounce and time taken
     :rtype: tuple
     """
+    try:
+        trajectory_data, (action, time) = read_result(output)
+    except Exception as error:
+        raise RuntimeError("AnyBubble crashed: {}".format(error))
 
-    output = output if output else tempfile.mkdtemp()
-
-    # Make extrema in Mathematica format
-
-    true_vacuum = curly(potential.true_vacuum)
-    false_vacuum = curly(potential.false_vacuum)
-
-    # Make Mathematica script that solves this problem
-
-    script = SCRIPT.format(os.environ["ANYBUBBLE"],
-                           potential.mathematica_potential,
-                           true_vacuum,
-                           false_vacuum,
-                           dim,
-                           output)
-
-    script_file = "{}/anybubble.ws".format(output)
+    return action, trajectory_data, time
 
-    with open(script_file, "w") as f:
-        f.write(script)
+class Kernel(Session):
+    """
+    Long-lived Wolfram kernel with AnyBubble loaded.
+    """
+    def __init__(self, command, end=END, timeout=None):
+        """
+        :param command: Command that starts the kernel
+        :type command: list
+        :param timeout: Time limit in seconds for starting the kernel and
+        loading AnyBubble
+        """
+        super(Kernel, self).__init__(command, end)
+        self.send(SETUP.format(os.environ["ANYBUBBLE"], end), timeout)
+
+    def solve(self, potential, dim=3, timeout=None):
+        """
+        :param timeout: Time limit in seconds, after which the kernel is
+        killed and started again for the next job
+        :returns: Action, trajectory of bounce and time taken
+        :rtype: tuple
+        """
+        request = REQUEST.format(solve_code(potential, dim), self.end.strip())
+        return parse(self.send(request, timeout))
+
+def kernel(timeout=None):
+    """
+    :param timeout: Time limit in seconds for starting the kernel, if it
+    isn't running
+    :returns: Running kernel, started if necessary
+    :rtype: Kernel
+    """
+    command = shlex.split(os.environ.get("ANYBUBBLE_KERNEL", "math -noprompt"))
+    return session(command, cls=Kernel, timeout=timeout)
 
-    # Execute Mathematica script
+def solve(potential, output=None, dim=3, persistent=False, hint=None, timeout=None,
+          **kwargs):
+    """
+    :param output: Directory in which to keep script, by default scratch space
+    :param persistent: Whether to solve in a long-lived kernel
+    :param hint: Trajectory of a bounce for a nearby potential, not used as
+    FindBubble takes no starting profile
+    :param timeout: Time limit in seconds, after which Mathematica is killed,
+    for starting a long-lived kernel and for each solve
+    :returns: Action, trajectory of bounce and time taken
+    :rtype: tuple
+    """
+    if persistent:
+        try:
+            running = kernel(timeout)
+        except TimedOut:
+            raise
+        except Exception as error:
+            raise RuntimeError("AnyBubble crashed: {}".format(error))
 
-    command = 'math -script {}'.format(script_file)
+        action, trajectory_data, time = running.solve(potential, dim, timeout)
+        return action, trajectory_data, time, "FindBubble"
 
-    try:
-        check_output(command, shell=True)
-    except Exception as error:
-        raise RuntimeError("AnyBubble crashed: {}".format(error))
+    # Make Mathematica script that solves this problem, in scratch space
+    # unless asked for a directory
 
-    # Read action, time and trajectory from text files
+    with scratch(output) as directory:
+        script = SCRIPT.format(os.environ["ANYBUBBLE"], solve_code(potential, dim))
+        script_file = "{}/anybubble.ws".format(directory)
 
-    trajectory_file = "{}/traj.txt".format(output)
-    trajectory_data = np.loadtxt(trajectory_file)
+        with open(script_file, "w") as f:
+            f.write(script)
 
-    new_order = [potential.n_fields] + list(range(potential.n_fields))
-    trajectory_data = trajectory_data[:, new_order]
+        # Execute Mathematica script and read results from its output
 
-    action_file = "{}/action.txt".format(output)
-    action = float(np.loadtxt(action_file))
+        command = 'math -script {}'.format(script_file)
 
-    time_file = "{}/time.txt".format(output)
-    time = float(np.loadtxt(time_file))
+        try:
+            printed = run(command, timeout)
+        except TimedOut:
+            raise
+        except Exception as error:
+            raise RuntimeError("AnyBubble crashed: {}".format(error))
 
+    action, trajectory_data, time = parse(printed)
     return action, trajectory_data, time, command
 
 if __name__ == "__main__":
@@ -5,39 +5,233 @@ Interface to BubbleProfiler
 >>> ginac_potential = "0.1*((-x + 2)^4 - 14*(-x + 2)^2 + 24*(-x + 2))"
 >>> from potential import Potential
 >>> solve(Potential(ginac_potential))
+
+In batch mode, potentials are solved by a long-lived driver built against the
+BubbleProfiler library, rather than by a run_cmd_line_potential process per
+potential:
+
+>>> solve(Potential(ginac_potential), batch=True)
+
+The driver is built once under $BUBBLEPROFILER_BUILD (by default
+$BUBBLEPROFILER/bubbler_driver) with flags from $BUBBLEPROFILER_CXXFLAGS and
+$BUBBLEPROFILER_LIBS. Set $BUBBLEPROFILER_DRIVER to use another executable
+that speaks the same protocol, e.g., a stub for testing.
+
+Each job is a line of tab-separated columns: potential, field names, false
+vacuum, true vacuum, initial step size, start and end of domain, relative
+tolerances for action and fields, number of dimensions, method ("shooting" or
+"perturbative") and, for shooting, the top of the barrier. The driver answers
+with rows of rho and fields, the action, and a line "end". A failed job
+answers with "error <message>" and "end". A stub driver that answers with this
+package's own codes is in bubbleprofiler_stub.py.
 """
 
 import os
-import tempfile
 import numpy as np
-from subprocess32 import check_call
 
+from build import build
+from estimate import scales
+from process import run, TimedOut
+from results import read_table, read_result
+from session import session, END
 from timer import clock
 
 
+HINT_DOMAIN = 4.
+STEP_SIZE = 0.1
+RTOL_ACTION = 1E-3
+N_BARRIER = 200
+INT_METHOD = "runge-kutta-4"
+
+DRIVER = """
+#include "algebraic_potential.hpp"
+#include "field_profiles.hpp"
+#include "perturbative_profiler.hpp"
+#include "profile_guesser.hpp"
+#include "relative_convergence_tester.hpp"
+#include "observers.hpp"
+#include "shooting.hpp"
+
+#include <Eigen/Core>
+
+#include <iomanip>
+#include <iostream>
+#include <memory>
+#include <sstream>
+#include <string>
+#include <vector>
+
+using namespace BubbleProfiler;
+
+std::vector<std::string> split(const std::string& line, char separator) {{
+   std::vector<std::string> parts;
+   std::stringstream stream(line);
+   std::string part;
+   while (std::getline(stream, part, separator)) {{
+      parts.push_back(part);
+   }}
+   return parts;
+}}
+
+Eigen::VectorXd vector(const std::string& column) {{
+   std::stringstream stream(column);
+   std::vector<double> values;
+   double value;
+   while (stream >> value) {{
+      values.push_back(value);
+   }}
+   Eigen::VectorXd result(values.size());
+   for (std::size_t i = 0; i < values.size(); ++i) {{
+      result(i) = values[i];
+   }}
+   return result;
+}}
+
+void print(const Field_profiles& profiles, const Eigen::VectorXd& false_vacuum) {{
+   const Eigen::VectorXd rho = profiles.get_coordinates();
+   const Eigen::MatrixXd values = profiles.get_field_profiles();
+
+   for (int i = 0; i < rho.size(); ++i) {{
+      std::cout << rho(i);
+      for (int j = 0; j < values.cols(); ++j) {{
+         std::cout << ' ' << values(i, j) + false_vacuum(j);
+      }}
+      std::cout << '\\n';
+   }}
+}}
+
+void solve(const std::vector<std::string>& job) {{
+   const std::string expression = job.at(0);
+   std::vector<std::string> fields;
+   std::stringstream names(job.at(1));
+   std::string name;
+   while (names >> name) {{
+      fields.push_back(name);
+   }}
+   Eigen::VectorXd false_vacuum = vector(job.at(2));
+   Eigen::VectorXd true_vacuum = vector(job.at(3));
+   const double step_size = std::stod(job.at(4));
+   const double rho_min = std::stod(job.at(5));
+   const double rho_max = std::stod(job.at(6));
+   const double rtol_action = std::stod(job.at(7));
+   const double rtol_fields = std::stod(job.at(8));
+   const int dim = std::stoi(job.at(9));
+   const std::string method = job.at(10);
+
+   // Put false vacuum at origin with zero potential, as run_cmd_line_potential
+
+   Algebraic_potential potential(fields, expression);
+   potential.translate_origin(false_vacuum);
+   potential.add_constant_term(-potential(Eigen::VectorXd::Zero(fields.size())));
+
+   if (method == "shooting") {{
+      const double barrier = std::stod(job.at(11)) - false_vacuum(0);
+      Shooting shooting;
+      shooting.solve(potential, 0., true_vacuum(0) - false_vacuum(0), barrier, dim,
+                     Shooting::Solver_options::Compute_action |
+                     Shooting::Solver_options::Compute_profile);
+      print(shooting.get_bubble_profile(), false_vacuum);
+      std::cout << shooting.get_euclidean_action() << '\\n';
+      return;
+   }}
+
+   RK4_perturbative_profiler profiler;
+   if (rho_min > 0.) profiler.set_domain_start(rho_min);
+   if (rho_max > 0.) profiler.set_domain_end(rho_max);
+   profiler.set_initial_step_size(step_size);
+   profiler.set_false_vacuum_loc(Eigen::VectorXd::Zero(fields.size()));
+   profiler.set_true_vacuum_loc(true_vacuum - false_vacuum);
+   profiler.set_number_of_dimensions(dim);
+   profiler.set_initial_guesser(std::make_shared<Kink_profile_guesser>());
+   profiler.set_convergence_tester(
+      std::make_shared<Relative_convergence_tester>(rtol_action, rtol_fields));
+
+   Dummy_observer observer;
+   profiler.calculate_bubble_profile(potential, observer);
+
+   print(profiler.get_bubble_profile(), false_vacuum);
+   std::cout << profiler.get_euclidean_action() << '\\n';
+}}
+
+int main() {{
+   std::cout << std::setprecision(17);
+   std::string line;
+
+   while (std::getline(std::cin, line)) {{
+      try {{
+         solve(split(line, '\\t'));
+      }} catch (const std::exception& error) {{
+         std::cout << "error " << error.what() << '\\n';
+      }}
+      std::cout << "{0}" << std::endl;
+   }}
+
+   return 0;
+}}
+"""
+
+
 def solve(potential,
           output=None,
-          step_size=0.1,
+          step_size=None,
           rho_min=-1.,
           rho_max=-1.,
-          rtol_action=1E-3,
+          rtol_action=None,
           rtol_fields=1E-3,
-          int_method='runge-kutta-4',
+          int_method=INT_METHOD,
           shooting=True,
-          dim=3):
+          dim=3,
+          batch=False,
+          hint=None,
+          timeout=None):
     """
     :param potential: Potential object or string
+    :param step_size: Initial step size, by default a fraction of the
+    estimated width of the wall
+    :param rho_max: End of domain, by default from the hint or from estimated
+    scales of the bubble
+    :param rtol_action: Relative tolerance on action, by default tightened for
+    a large estimated action
+    :param batch: Whether to solve in a long-lived driver, which neither
+    writes an output file nor changes the integration method
+    :param hint: Trajectory of a bounce for a nearby potential, from which to
+    choose the end of the domain if it isn't given
+    :param timeout: Time limit in seconds, after which BubbleProfiler is killed
     :returns: Action, trajectory of bounce, time taken and extra information
     :rtype: tuple
     """
+    estimated = scales(potential, dim)
+
+    if step_size is None:
+        step_size = estimated.step if estimated else STEP_SIZE
+
+    if rtol_action is None:
+        rtol_action = estimated.rtol(RTOL_ACTION) if estimated else RTOL_ACTION
+
+    if hint is not None and rho_max < 0.:
+        rho_max = HINT_DOMAIN * hint.radius
+    elif estimated and rho_max < 0.:
+        rho_max = estimated.domain
+
     if potential.n_fields > 1:
         shooting = False
 
+    if batch:
+        if output or int_method != INT_METHOD:
+            raise ValueError("Batch driver writes no files and integrates only with {}"
+                             .format(INT_METHOD))
+        return solve_batch(potential, step_size, rho_min, rho_max,
+                           rtol_action, rtol_fields, shooting, dim, timeout)
+
     # System call to BubblerProfiler executable
 
     shooting_str = "" if shooting else "--perturbative"
 
-    output = output if output else tempfile.mkstemp()[1]
+    # Unless asked for a file, profiles are written to a pipe (descriptor 3,
+    # duplicated from standard output) and parsed without touching the disk
+
+    to_pipe = not output
+    output = "/dev/fd/3" if to_pipe else output
 
     field_names = " ".join(["--field '{}'".format(n)
                             for n in potential.field_names])
@@ -60,7 +254,7 @@ def solve(potential,
                 "--integration-method {int_method} "
                 "--n-dims {dim} "
                 "{shooting_str}"
-                " > /dev/null 2>&1")
+                "{redirect}")
 
     command = template.format(loc=os.environ["BUBBLEPROFILER"],
                               ginac_potential=potential.ginac_potential,
@@ -75,26 +269,120 @@ def solve(potential,
                               rtol_fields=rtol_fields,
                               int_method=int_method,
                               dim=dim,
-                              shooting_str=shooting_str)
+                              shooting_str=shooting_str,
+                              redirect=" 3>&1 > /dev/null 2>&1" if to_pipe else " > /dev/null 2>&1")
 
     try:
         with clock() as time:
-            check_call(command, shell=True)
+            printed = run(command, timeout)
+            if not to_pipe:
+                with open(output) as f:
+                    printed = f.read()
+    except TimedOut:
+        raise
     except Exception as error:
         raise RuntimeError("BubbleProfiler crashed: {}".format(error))
 
-    # Read action
-
-    with open(output) as f:
-        action_line = f.readline()
-    action = float(action_line.split(":")[-1])
+    # Read action from first line, then fields from the rest
 
-    # Read fields
+    action_line, _, rows = printed.partition("\n")
 
-    trajectory_data = np.loadtxt(output)
+    try:
+        action = float(action_line.split(":")[-1])
+        trajectory_data = read_table(rows)
+    except Exception as error:
+        raise RuntimeError("BubbleProfiler crashed: {}".format(error))
 
     return action, trajectory_data, time.time, command
 
+def driver(timeout=None):
+    """
+    :param timeout: Time limit in seconds for building the driver
+    :returns: Name of driver executable, built if not already built
+    """
+    if "BUBBLEPROFILER_DRIVER" in os.environ:
+        return os.environ["BUBBLEPROFILER_DRIVER"]
+
+    bubbleprofiler = os.environ["BUBBLEPROFILER"]
+    default = os.path.join(bubbleprofiler, "bubbler_driver")
+    root = os.environ.get("BUBBLEPROFILER_BUILD", default)
+
+    flags = "-O2 -std=c++11 -I{0}/include -I/usr/include/eigen3".format(bubbleprofiler)
+    libs = "-L{0}/lib -lbubbler -lginac -lcln -lnlopt -lgsl -lgslcblas".format(bubbleprofiler)
+
+    command = "{cxx} {flags} -o {{executable}} {{code}} {libs}".format(
+        cxx=os.environ.get("CXX", "g++"),
+        flags=os.environ.get("BUBBLEPROFILER_CXXFLAGS", flags),
+        libs=os.environ.get("BUBBLEPROFILER_LIBS", libs))
+
+    try:
+        return build(DRIVER.format(END), root, command, timeout=timeout)
+    except TimedOut:
+        raise
+    except Exception as error:
+        raise RuntimeError("BubbleProfiler driver build crashed: {}".format(error))
+
+def solve_batch(potential,
+                step_size=STEP_SIZE,
+                rho_min=-1.,
+                rho_max=-1.,
+                rtol_action=RTOL_ACTION,
+                rtol_fields=1E-3,
+                shooting=True,
+                dim=3,
+                timeout=None):
+    """
+    :param potential: Potential object
+    :param shooting: Whether to shoot, rather than use the perturbative
+    method, for a single field
+    :param timeout: Time limit in seconds, after which the driver is killed
+    and started again for the next job
+    :returns: Action, trajectory of bounce, time taken and extra information
+    :rtype: tuple
+
+    Solves with the same method as run_cmd_line_potential in a long-lived
+    driver, so that a scan pays for one process rather than one per
+    potential.
+    """
+    command = driver(timeout)
+    shooting = shooting and potential.n_fields == 1
+
+    # Shooting needs the top of the barrier between the vacua
+
+    if shooting:
+        phi = np.linspace(potential.true_vacuum[0], potential.false_vacuum[0], N_BARRIER)
+        barrier = phi[np.argmax(potential.vector_potential(phi[:, np.newaxis]))]
+    else:
+        barrier = 0.
+
+    columns = [potential.ginac_potential,
+               " ".join(potential.field_names_str),
+               " ".join(repr(float(v)) for v in potential.false_vacuum),
+               " ".join(repr(float(v)) for v in potential.true_vacuum),
+               repr(float(step_size)),
+               repr(float(rho_min)),
+               repr(float(rho_max)),
+               repr(float(rtol_action)),
+               repr(float(rtol_fields)),
+               str(int(dim)),
+               "shooting" if shooting else "perturbative",
+               repr(float(barrier))]
+
+    with clock() as time:
+        try:
+            output = session([command]).send("\t".join(columns) + "\n", timeout)
+        except TimedOut:
+            raise
+        except Exception as error:
+            raise RuntimeError("BubbleProfiler crashed: {}".format(error))
+
+    try:
+        trajectory_data, numbers = read_result(output)
+    except Exception as error:
+        raise RuntimeError("BubbleProfiler crashed: {}".format(error))
+
+    return numbers[0], trajectory_data, time.time, command
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
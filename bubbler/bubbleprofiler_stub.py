@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Stub BubbleProfiler driver
+==========================
+
+Speaks the protocol of the batch driver, but answers each job with this
+package's own codes, shooting for one field and gradient flow otherwise, so
+that batch mode can be tried without BubbleProfiler:
+
+$ export BUBBLEPROFILER_DRIVER=/path/to/bubbler/bubbleprofiler_stub.py
+
+>>> print answer("0.1*((-x + 2)^4 - 14*(-x + 2)^2 + 24*(-x + 2))\\tx\\t0\\t5\\t0.1\\t-1\\t-1\\t0.001\\t0.001\\t3\\tshooting\\t2").splitlines()[-1]
+"""
+
+import sys
+
+from potential import Potential
+import gradient_flow
+import shooting
+from session import END
+
+
+def answer(line):
+    """
+    :param line: Job of tab-separated columns
+    :returns: Rows of rho and fields and the action, or an error
+    :rtype: str
+    """
+    try:
+        columns = line.rstrip("\n").split("\t")
+        expression, names, false_vacuum, true_vacuum = columns[:4]
+        dim, method = int(columns[9]), columns[10]
+
+        potential = Potential(expression,
+                              true_vacuum=map(float, true_vacuum.split()),
+                              false_vacuum=map(float, false_vacuum.split()),
+                              polish=False)
+
+        if potential.field_names_str != names.split():
+            raise ValueError("Fields {} are not {}".format(names, potential.field_names_str))
+
+        code = shooting if method == "shooting" else gradient_flow
+        action, trajectory_data, _, _ = code.solve(potential, dim=dim)
+    except Exception as error:
+        return "error {}".format(str(error).replace("\n", " "))
+
+    rows = "\n".join(" ".join("%.17g" % x for x in row)
+                     for row in trajectory_data[:, :potential.n_fields + 1])
+    return "{}\n{:.17g}".format(rows, action)
+
+def main():
+    """
+    Answer jobs from standard input until it is closed.
+    """
+    for line in iter(sys.stdin.readline, ""):
+        print answer(line)
+        print END
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
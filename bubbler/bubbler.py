@@ -14,6 +14,10 @@ Solve it with all codes:
 
 >>> print bubblers(ginac_potential)
 
+or with all codes running at the same time:
+
+>>> print bubblers(ginac_potential, concurrent=True)
+
 Plot results from a few codes:
 
 >>> profiles(ginac_potential)
@@ -21,34 +25,70 @@ Plot results from a few codes:
 Look at a one-dimensional potential:
 
 >>> one_dim_bubblers(1., 0.6)
+
+Solve many potentials with all codes on a pool of processes:
+
+>>> alphas = np.linspace(0.5, 0.75, 500, endpoint=False)
+>>> results = scan(one_dim_potential, grid=[(1., a) for a in alphas])
+
+or have results as soon as each point is solved, checkpointed to disk so that
+a scan that was stopped carries on where it left off:
+
+>>> for i, results in iscan(one_dim_potential, grid=[(1., a) for a in alphas], store="scan"):
+...     print alphas[i], results
+
+or race the codes, keeping the first sane solution and stopping the rest,
+with the slower codes started only if the faster ones haven't finished:
+
+>>> print race(ginac_potential, delays={"bubbleprofiler": 1., "anybubble": 5.})
+
+Solve a whole family of single-field potentials at once by shooting:
+
+>>> family = [one_dim_potential(1., a) for a in alphas]
+>>> results = batch_bubbler(family)
 """
 
+import os
+import time
+import threading
+import Queue
 from collections import namedtuple
 from itertools import cycle
-from scipy.interpolate import interp1d
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
 import matplotlib.pyplot as plt
 import numpy as np
 
 
 from potential import Potential, one_dim_potential
+from trajectory import Trajectory
+from store import ScanStore, META, FLOAT
+from process import call, Cancel, TimedOut
 import cosmotransitions
 import bubbleprofiler
 import anybubble
+import simplebounce
+import shooting
+import gradient_flow
 
 
-BACKENDS = ["cosmotransitions", "bubbleprofiler", "anybubble"]
-ATTRIBUTES = ['backend', 'action', 'trajectory', 'rho_end', 'time', 'command']
-
-def interp(x, y):
-    """
-    :returns: One-dimensional function
-    """
-    return interp1d(x, y, fill_value=(y[0], y[-1]), bounds_error=False)
+BACKENDS = ["cosmotransitions", "bubbleprofiler", "anybubble", "shooting", "gradient_flow"]
+IN_PROCESS = ["cosmotransitions", "shooting", "gradient_flow"]
+ATTRIBUTES = ['backend', 'action', 'trajectory', 'rho_end', 'time', 'command', 'timed_out']
+RACE = ["shooting", "cosmotransitions", "gradient_flow", "bubbleprofiler", "anybubble"]
+SANE_END = 0.1
 
 class Solution(namedtuple('Solution', ATTRIBUTES)):
     """
     Single solution.
     """
+    def __new__(cls, backend, action, trajectory, rho_end, time, command, timed_out=False):
+        """
+        :param timed_out: Whether the code ran out of time
+        """
+        return super(Solution, cls).__new__(cls, backend, action, trajectory, rho_end,
+                                            time, command, timed_out)
+
     def __str__(self):
         """
         :returns: Pretty string of a solution
@@ -66,46 +106,435 @@ class Solutions(dict):
         """
         return "\n\n".join([str(s) for s in self.itervalues()])
 
-def bubbler(potential, backend="cosmotransitions", **kwargs):
+def bubbler(potential, backend="cosmotransitions", cache=None, hint=None, timeout=None,
+            **kwargs):
     """
     :param potential: Potential object or string
     :param backend: Code with which to solve bounce
+    :param cache: Cache of previous results
+    :param hint: Solution for a nearby potential from which to start
+    :param timeout: Time limit in seconds, after which the code is stopped and
+    the solution is marked as timed out
     :returns: Results from a particular code
     :rtype: namedtuple
+
+    External codes are killed with everything that they started; codes that
+    run in this process are run in a forked child, which is killed likewise.
     """
     try:
 
-        # Call function
+        # Call function, unless result is already in cache. A hint changes
+        # only how the solution is found, so isn't part of the key
 
         module = globals()[backend]
         potential = Potential(potential) if isinstance(potential, str) else potential
-        action, trajectory_data, time, command = module.solve(potential, **kwargs)
 
-        # Make interpolation function from output
+        key = cache.key(potential, backend, **kwargs) if cache else None
+        result = cache.get(key) if cache else None
 
-        trajectory = [interp(trajectory_data[:, 0], trajectory_data[:, i + 1])
-                      for i in range(potential.n_fields)] if trajectory_data is not None else None
+        if result is None:
+            if hint is not None and hint.action is not None and hint.trajectory is not None:
+                kwargs["hint"] = hint.trajectory
+            if backend in IN_PROCESS:
+                result = call(module.solve, (potential,), kwargs, timeout, backend)
+            else:
+                result = module.solve(potential, timeout=timeout, **kwargs)
+            if cache:
+                cache.put(key, result)
 
-        # Find maximum value of rho
+        return _solution(potential, backend, result)
 
-        rho_end = trajectory_data[-1, 0] if trajectory_data is not None else None
+    except TimedOut as error:
 
-        return Solution(backend, action, trajectory, rho_end, time, command)
+        return Solution(backend, None, None, None, timeout, error.message, True)
 
     except Exception as error:
 
         return Solution(backend, None, None, None, None, error.message)
 
-def bubblers(potential, backends=None, **kwargs):
+def _solution(potential, backend, result):
+    """
+    :param result: Action, trajectory of bounce, time taken and extra
+    information from a code
+    :returns: Results from a particular code
+    :rtype: namedtuple
+    """
+    action, trajectory_data, time, command = result
+
+    # Keep output as one array, interpolated when first needed
+
+    trajectory = Trajectory(trajectory_data[:, :potential.n_fields + 1]) \
+                 if trajectory_data is not None else None
+
+    # Find maximum value of rho
+
+    rho_end = trajectory.rho_end if trajectory is not None else None
+
+    return Solution(backend, action, trajectory, rho_end, time, command)
+
+def batch_bubbler(potentials, backend="shooting", **kwargs):
+    """
+    :param potentials: Potential objects of the same form, differing only in
+    parameters, e.g., from Potential.bind
+    :param backend: Code that solves many potentials at once
+    :returns: Results from a particular code for each potential, in order
+    :rtype: list of namedtuple
+
+    Only shooting solves potentials at once, so that, e.g., a whole curve of
+    actions against a parameter is found in one call.
+    """
+    potentials = list(potentials)
+
+    try:
+        results = globals()[backend].solve_family(potentials, **kwargs)
+    except Exception as error:
+        return [Solution(backend, None, None, None, None, error.message) for _ in potentials]
+
+    return [_solution(p, backend, r) if not isinstance(r, Exception) else
+            Solution(backend, None, None, None, None, r.message)
+            for p, r in zip(potentials, results)]
+
+def settings(backends, options, kwargs):
+    """
+    :param options: Extra settings for particular codes
+    :type options: dict of dict
+    :returns: Settings for each code
+    :rtype: dict of dict
+    """
+    options = options if options else {}
+    return {b: dict(kwargs, **options.get(b, {})) for b in backends}
+
+def bubblers(potential, backends=None, concurrent=False, options=None, **kwargs):
     """
     :param potential: Potential object or string
     :param backend: Code with which to solve bounce
+    :param concurrent: Whether to run all codes at the same time
+    :param options: Extra settings for particular codes, e.g.,
+    {"anybubble": {"persistent": True, "timeout": 60.}}
     :returns: Results from all codes
     :rtype: list of namedtuple
+
+    In concurrent mode, each code is run in its own thread. The external codes
+    run in their own processes, so the time taken is that of the slowest code.
+    The potential is built beforehand, so that codes forked from threads
+    don't inherit locks held part way through building it.
+
+    A time limit, e.g., timeout=10., applies to every code, unless options
+    give one for a particular code.
     """
     potential = Potential(potential) if isinstance(potential, str) else potential
     backends = backends if backends else BACKENDS
-    return Solutions({b: bubbler(potential, backend=b, **kwargs) for b in backends})
+    kwargs = settings(backends, options, kwargs)
+
+    if not concurrent:
+        return Solutions({b: bubbler(potential, backend=b, **kwargs[b]) for b in backends})
+
+    potential.build()
+    pool = ThreadPool(len(backends))
+
+    try:
+        pending = {b: pool.apply_async(bubbler, (potential, b), kwargs[b]) for b in backends}
+        results = Solutions({b: p.get() for b, p in pending.iteritems()})
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return results
+
+def sane(solution, potential):
+    """
+    :param solution: Solution from a code
+    :param potential: Potential object
+    :returns: Whether the solution looks like a bounce
+    :rtype: bool
+
+    The action must be finite and positive, the fields must start where the
+    potential is below the false vacuum and end near the false vacuum.
+    """
+    if solution.action is None or not np.isfinite(solution.action) or solution.action <= 0.:
+        return False
+
+    if solution.trajectory is None:
+        return True
+
+    fields = solution.trajectory.fields
+    true = np.asarray(potential.true_vacuum, dtype=float)
+    false = np.asarray(potential.false_vacuum, dtype=float)
+    scale = np.sqrt(np.sum((false - true)**2))
+
+    return bool(np.all(np.isfinite(fields)) and
+                potential.vector_potential(fields[0]) < potential.vector_potential(false) and
+                np.sqrt(np.sum((fields[-1] - false)**2)) < SANE_END * scale)
+
+def _racer(potential, backend, kwargs, cancel, finished):
+    """
+    Solve with a code that can be cancelled, and report its solution.
+    """
+    with cancel:
+        solution = bubbler(potential, backend=backend, **kwargs)
+
+    finished.put(solution)
+
+def race(potential, backends=None, delays=None, check=sane, options=None, **kwargs):
+    """
+    :param potential: Potential object or string
+    :param backends: Codes to race, in the order in which they are started
+    :param delays: Seconds after the start at which particular codes are
+    started, e.g., {"anybubble": 5.}, by default at once
+    :param check: Function of a solution and the potential that says whether
+    to accept it
+    :param options: Extra settings for particular codes
+    :returns: First solution that passes the check, else that from the first
+    code
+    :rtype: namedtuple
+
+    Each code is run in its own thread, and everything that it starts is
+    killed once a solution is accepted, after which the threads are joined.
+    A delayed code is started early if every code already started has
+    failed, and isn't started at all if a solution is accepted before its
+    delay.
+    """
+    potential = Potential(potential) if isinstance(potential, str) else potential
+    backends = backends if backends else RACE
+    delays = delays if delays else {}
+    kwargs = settings(backends, options, kwargs)
+    potential.build()
+
+    start = time.time()
+    waiting = list(backends)
+    cancels = {}
+    threads = []
+    failed = {}
+    finished = Queue.Queue()
+    accepted = None
+
+    try:
+        while waiting or len(failed) < len(cancels):
+
+            # Start codes whose delay has passed, or the next if none is running
+
+            while waiting and (delays.get(waiting[0], 0.) <= time.time() - start or
+                               len(failed) == len(cancels)):
+                backend = waiting.pop(0)
+                cancels[backend] = Cancel()
+                threads.append(threading.Thread(target=_racer,
+                                                args=(potential, backend, kwargs[backend],
+                                                      cancels[backend], finished)))
+                threads[-1].start()
+
+            # Wait for a solution or the next delay; a wait without a time
+            # limit couldn't be interrupted
+
+            wait = max(delays.get(waiting[0], 0.) - (time.time() - start), 0.) \
+                   if waiting else 1E6
+
+            try:
+                solution = finished.get(timeout=wait)
+            except Queue.Empty:
+                continue
+
+            if solution.action is not None and check(solution, potential):
+                accepted = solution
+                break
+
+            failed[solution.backend] = solution
+    finally:
+        for cancel in cancels.itervalues():
+            cancel.cancel()
+
+        # Losing codes stop quickly once their processes are killed
+
+        for thread in threads:
+            thread.join()
+
+    return accepted if accepted is not None else failed[backends[0]]
+
+def _scan_job(job):
+    """
+    :param job: Potential or factory, parameters, backend and solver arguments
+    :returns: Result from a particular code for a single point of a scan
+    :rtype: namedtuple
+    """
+    potential, params, backend, kwargs = job
+
+    if params is not None:
+        try:
+            potential = potential(*params)
+        except Exception as error:
+            return Solution(backend, None, None, None, None, error.message)
+
+    return bubbler(potential, backend=backend, **kwargs)
+
+def _indexed_scan_job(indexed):
+    """
+    :param indexed: Number of job and job
+    :returns: Number of job and its result
+    :rtype: tuple
+    """
+    i, job = indexed
+    return i, _scan_job(job)
+
+def iscan(potentials, backends=None, grid=None, processes=None, options=None,
+          store=None, continuation=False, **kwargs):
+    """
+    :param potentials: List of Potential objects or strings, or a factory of
+    potentials if a grid is given
+    :param backends: Codes with which to solve bounce
+    :param grid: Parameters with which the factory is called for each point
+    :param processes: Number of worker processes, by default the number of cores
+    :param options: Extra settings for particular codes
+    :param store: ScanStore, or directory of one, in which to checkpoint
+    :param continuation: Whether to start each point from the solution at the
+    previous point
+    :returns: Number of each point and results from all codes for it, as
+    soon as they are ready
+    :rtype: generator of tuple
+
+    Every finished point is appended to the store before it is yielded.
+    Points already in the store, e.g., from a scan that was killed, are
+    skipped. A store with points at other parameters, e.g., from another
+    grid, is refused.
+
+    In continuation, the points still to solve are split into a chain per
+    process, and each code solves the points of a chain in order with its
+    last solution in the chain as a hint, even across points skipped as
+    already in the store.
+    """
+    backends = backends if backends else BACKENDS
+    kwargs = settings(backends, options, kwargs)
+
+    if grid is not None:
+        points = [(potentials, tuple(params) if isinstance(params, (tuple, list)) else (params,))
+                  for params in grid]
+    else:
+        points = [(potential, None) for potential in potentials]
+
+    if store is not None and not isinstance(store, ScanStore):
+        n_params = len(points[0][1]) if grid is not None and points else 0
+        store = ScanStore(store, backends=backends, n_params=n_params)
+
+    if store is not None and store.backends != list(backends):
+        raise ValueError("Store has results for {}, not {}".format(store.backends, backends))
+
+    rows = {i: row for row, i in enumerate(store.points())} if store is not None else {}
+
+    # A stored point is skipped only if it is the same point of the same grid
+
+    if rows:
+        stored = store.params()
+
+        for i, row in rows.iteritems():
+            if i >= len(points):
+                raise ValueError("Store has point {}, beyond the {} points of the scan"
+                                 .format(i, len(points)))
+            params = np.asarray(points[i][1] if points[i][1] is not None else (), dtype=FLOAT)
+            if not np.array_equal(stored[row], params):
+                raise ValueError("Store has point {} at {}, not {}"
+                                 .format(i, list(stored[row]), list(params)))
+
+    todo = [i for i in range(len(points)) if i not in rows]
+
+    if not todo:
+        return
+
+    # Solve all points at once, or chains of points one step at a time. Each
+    # code in a chain starts from its last solution in that chain, which
+    # for the first point is from the nearest point before it in the store
+
+    chain_of = {}
+    hints = {}
+
+    if continuation:
+        n_chains = min(processes if processes else cpu_count(), len(todo))
+        chains = [list(c) for c in np.array_split(todo, n_chains)]
+        waves = [[c[step] for c in chains if len(c) > step]
+                 for step in range(len(chains[0]))]
+        chain_of = {i: k for k, c in enumerate(chains) for i in c}
+
+        for k, c in enumerate(chains):
+            before = [j for j in rows if j < c[0]]
+            if before:
+                hints[k] = dict(store.solutions(rows[max(before)]))
+    else:
+        waves = [todo]
+
+    pool = Pool(processes)
+
+    try:
+        for wave in waves:
+
+            jobs = []
+
+            for i in wave:
+                for backend in backends:
+                    hint = hints.get(chain_of.get(i), {}).get(backend)
+                    job_kwargs = dict(kwargs[backend], hint=hint) if hint else kwargs[backend]
+                    jobs.append((i, (points[i][0], points[i][1], backend, job_kwargs)))
+
+            pending = {}
+
+            for i, result in pool.imap_unordered(_indexed_scan_job, jobs):
+                pending.setdefault(i, {})[result.backend] = result
+
+                if len(pending[i]) < len(backends):
+                    continue
+
+                results = Solutions(pending.pop(i))
+
+                if store is not None:
+                    store.append(results, points[i][1] if points[i][1] is not None else (), i)
+
+                if continuation:
+                    hints.setdefault(chain_of[i], {}).update(
+                        (b, r) for b, r in results.iteritems() if r.action is not None)
+
+                yield i, results
+
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        # Workers that finish normally remove their scratch space
+
+        pool.join()
+
+        if store is not None:
+            store.flush()
+
+def scan(potentials, backends=None, grid=None, processes=None, options=None,
+         store=None, continuation=False, **kwargs):
+    """
+    :param potentials: List of Potential objects or strings, or a factory of
+    potentials if a grid is given
+    :param backends: Codes with which to solve bounce
+    :param grid: Parameters with which the factory is called for each point
+    :param processes: Number of worker processes, by default the number of cores
+    :param options: Extra settings for particular codes
+    :param store: ScanStore, or directory of one, in which to checkpoint
+    :param continuation: Whether to start each point from the solution at the
+    previous point
+    :returns: Results from all codes for each point, in input order
+    :rtype: list of Solutions
+
+    Jobs for every potential and code are solved on a pool of processes. The
+    factory, e.g., one_dim_potential, must be importable by the workers.
+    Points already in the store are read from it rather than solved.
+    """
+    if store is not None and not isinstance(store, ScanStore) and \
+            os.path.isfile(os.path.join(store, META)):
+        store = ScanStore(store)
+
+    results = dict(iscan(potentials, backends, grid, processes, options, store,
+                         continuation, **kwargs))
+
+    if isinstance(store, ScanStore):
+        for row, i in enumerate(store.points()):
+            if i not in results:
+                results[i] = store.solutions(row)
+
+    return [results[i] for i in sorted(results)]
 
 def profiles(potential, backends=None, **kwargs):
     """
@@ -129,10 +558,11 @@ def profiles(potential, backends=None, **kwargs):
         color = next(colors)
         lines = cycle(["-", "--", "-."])
         rho = np.linspace(0, result.rho_end, 1000)
+        fields = result.trajectory(rho)
 
-        for name, trajectory in zip(potential.field_latex, result.trajectory):
+        for name, field in zip(potential.field_latex, fields.T):
             ax.plot(rho,
-                    trajectory(rho),
+                    field,
                     ls=next(lines),
                     c=color,
                     lw=3,
@@ -0,0 +1,72 @@
+"""
+Cached builds of generated C++ programs
+=======================================
+
+Each program is built once in its own directory, named by a hash of its code
+and build command, and reused afterwards. Anything that programs share, e.g.,
+a library object, is made first under a lock on the root directory, held
+against other threads and processes alike.
+"""
+
+import os
+import errno
+import fcntl
+import hashlib
+import tempfile
+
+from process import run
+
+
+LOCK = ".lock"
+
+
+def build(code, root, command, name="bubbler", shared=None, timeout=None):
+    """
+    :param code: C++ code for a program
+    :param root: Directory in which to make a directory for the program
+    :param command: Build command with {code} and {executable} placeholders
+    :param name: Name of code and executable files
+    :param shared: Command that makes what programs share, run under a lock
+    :param timeout: Time limit in seconds for each command
+    :returns: Name of executable, built if not already built
+    """
+    key = hashlib.sha1(code + command).hexdigest()
+    directory = os.path.join(root, key)
+    executable = os.path.join(directory, name + ".x")
+
+    if os.path.isfile(executable):
+        return executable
+
+    try:
+        os.makedirs(directory)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+
+    # Write code and build in temporary files, then move them into place, so
+    # that concurrent builds of the same program don't see partial files
+
+    code_file = os.path.join(directory, name + ".cc")
+    handle, temp_code = tempfile.mkstemp(dir=directory, suffix=".cc")
+
+    with os.fdopen(handle, "w") as f:
+        f.write(code)
+
+    os.rename(temp_code, code_file)
+
+    if shared:
+        with open(os.path.join(root, LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            run(shared, timeout)
+
+    handle, temp_executable = tempfile.mkstemp(dir=directory, suffix=".x")
+    os.close(handle)
+
+    try:
+        run(command.format(code=code_file, executable=temp_executable), timeout)
+        os.rename(temp_executable, executable)
+    finally:
+        if os.path.exists(temp_executable):
+            os.remove(temp_executable)
+
+    return executable
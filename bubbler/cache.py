@@ -0,0 +1,131 @@
+"""
+Cache of solved bounces
+=======================
+
+Solutions are stored on disk, keyed by the potential, its vacua, the code and
+the settings passed to the code. The directory is $BUBBLER_CACHE, or
+~/.cache/bubbler by default.
+
+>>> ginac_potential = "0.1*((-x + 2)^4 - 14*(-x + 2)^2 + 24*(-x + 2))"
+>>> from bubbler import bubbler
+>>> cache = Cache(max_size=10**9)
+>>> print bubbler(ginac_potential, cache=cache)
+
+The second call reads the stored solution:
+
+>>> print bubbler(ginac_potential, cache=cache)
+"""
+
+import os
+import hashlib
+import tempfile
+import cPickle as pickle
+
+
+EXTENSION = ".pkl"
+
+
+class Cache(object):
+    """
+    On-disk cache of results from codes with least-recently-used eviction.
+    """
+    def __init__(self, path=None, max_size=2**30):
+        """
+        :param path: Directory in which to store results
+        :param max_size: Maximum total size of stored results in bytes
+        """
+        default = os.path.join(os.path.expanduser("~"), ".cache", "bubbler")
+        self.path = path if path else os.environ.get("BUBBLER_CACHE", default)
+        self.max_size = max_size
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def key(self, potential, backend, **kwargs):
+        """
+        :returns: Hash of potential, vacua, code and settings
+        """
+        settings = sorted((k, repr(v)) for k, v in kwargs.iteritems())
+        content = repr((potential.ginac_potential,
+                        potential.true_vacuum.tolist(),
+                        potential.false_vacuum.tolist(),
+                        backend,
+                        settings))
+        return hashlib.sha1(content).hexdigest()
+
+    def _file(self, key):
+        """
+        :returns: Name of file for a key
+        """
+        return os.path.join(self.path, key + EXTENSION)
+
+    def get(self, key):
+        """
+        :returns: Stored result for a key, or None if there isn't one
+        """
+        name = self._file(key)
+
+        try:
+            with open(name, "rb") as f:
+                result = pickle.load(f)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+
+        # Mark as recently used
+
+        try:
+            os.utime(name, None)
+        except OSError:
+            pass
+
+        return result
+
+    def put(self, key, result):
+        """
+        Store a result for a key and evict old results if necessary.
+        """
+        handle, temp_name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        with os.fdopen(handle, "wb") as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+
+        os.rename(temp_name, self._file(key))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least-recently-used results until the cache fits in its size.
+        """
+        entries = []
+
+        for name in os.listdir(self.path):
+            if not name.endswith(EXTENSION):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        size = sum(e[1] for e in entries)
+
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        """
+        Remove all stored results.
+        """
+        for name in os.listdir(self.path):
+            if name.endswith(EXTENSION):
+                os.remove(os.path.join(self.path, name))
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -8,53 +8,109 @@ Interface to CosmoTransitions
 """
 
 import numpy as np
+from scipy.interpolate import splev
 
 from cosmoTransitions.pathDeformation import fullTunneling
+from cosmoTransitions.tunneling1D import SingleFieldInstanton
+from estimate import scales
 from timer import clock
 
 
-def solve(potential, dim=3, **kwargs):
+GUESS_POINTS = 10
+TOL = 1E-4
+
+class AnalyticInstanton(SingleFieldInstanton):
     """
-    :param potential: Potential object or string
-    :returns: Action, trajectory of bounce, time taken and extra information
-    :rtype: tuple
+    Single-field instanton along a path, with the second derivative along the
+    path found from the analytic Hessian rather than by finite differences.
     """
-    def get_fields(cosmo_fields):
+    def __init__(self, phi_absMin, phi_metaMin, V, dV=None, d2V=None,
+                 potential=None, **kwargs):
         """
-        :returns: Fields without CosmoTransitions signature
+        :param V: Potential along the path, a method of the path
+        :param potential: Potential object with analytic Hessian
         """
-        return [cosmo_fields[..., i] for i in range(potential.n_fields)]
+        if d2V is None and potential is not None:
+            d2V = path_d2V(V.__self__, potential)
 
-    def vector_potential(cosmo_fields):
-        """
-        :returns: Potential in CosmoTransitions signature
-        """
-        fields = get_fields(cosmo_fields)
-        return potential(*fields)
+        SingleFieldInstanton.__init__(self, phi_absMin, phi_metaMin, V, dV, d2V,
+                                      **kwargs)
 
-    def vector_gradient(cosmo_fields):
+def path_d2V(path, potential):
+    """
+    :returns: Second derivative of potential with respect to distance along path
+    """
+    tck = path._path_tck
+    degree = tck[2]
+
+    def d2V(x):
         """
-        :returns: Gradient in CosmoTransitions signature
+        :returns: d^2V/dx^2 = p'.H.p' + grad(V).p''
         """
-        fields = get_fields(cosmo_fields)
-        cosmo_gradient = np.empty_like(cosmo_fields)
-        cosmo_gradient[..., :] = potential.gradient(*fields).T
-        return cosmo_gradient.astype(float)
+        pts = np.array(splev(x, tck)).T
+        dpts = np.array(splev(x, tck, der=1)).T
+        curvature = np.einsum('...i,...ij,...j->...', dpts, potential.vector_hessian(pts), dpts)
+
+        if degree < 2:
+            return curvature
 
+        d2pts = np.array(splev(x, tck, der=2)).T
+        return curvature + np.sum(potential.vector_gradient(pts) * d2pts, axis=-1)
+
+    return d2V
+
+def guess_path(potential, hint=None, n_points=GUESS_POINTS):
+    """
+    :param hint: Trajectory of a bounce for a nearby potential
+    :param n_points: Number of points taken from the hint
+    :returns: Path from true to false vacuum with which to start deformation
+    :rtype: array
+
+    The path is a straight line, unless there is a hint, in which case it
+    follows the path of the hint, sampled evenly in length, between the
+    vacua of this potential.
+    """
+    if hint is None or potential.n_fields == 1:
+        return np.array([potential.true_vacuum, potential.false_vacuum])
+
+    fields = hint.fields
+    length = np.concatenate(([0.], np.cumsum(np.sqrt(np.sum(np.diff(fields, axis=0)**2, axis=1)))))
+    samples = np.linspace(0., length[-1], n_points + 2)[1:-1]
+    points = np.array([np.interp(samples, length, f) for f in fields.T]).T
+
+    return np.vstack((potential.true_vacuum, points, potential.false_vacuum))
+
+def solve(potential, dim=3, hint=None, **kwargs):
+    """
+    :param potential: Potential object or string
+    :param hint: Trajectory of a bounce for a nearby potential, from which to
+    start deforming the path
+    :returns: Action, trajectory of bounce, time taken and extra information
+    :rtype: tuple
+
+    Unless given, tolerances of the profile are tightened for a large
+    estimated action.
+    """
     # Make initial guess of trajectory
 
-    guess = np.empty([2, potential.n_fields])
-    guess[0, :] = potential.true_vacuum
-    guess[1, :] = potential.false_vacuum
+    guess = guess_path(potential, hint)
+
+    estimated = scales(potential, dim)
+
+    if estimated and "tunneling_findProfile_params" not in kwargs:
+        tol = estimated.rtol(TOL)
+        kwargs["tunneling_findProfile_params"] = {'xtol': tol, 'phitol': tol}
 
     # Run CosmoTransitions
 
     with clock() as time:
         try:
             result = fullTunneling(guess,
-                                   vector_potential,
-                                   vector_gradient,
-                                   tunneling_init_params={'alpha': dim - 1},
+                                   potential.vector_potential,
+                                   potential.vector_gradient,
+                                   tunneling_class=AnalyticInstanton,
+                                   tunneling_init_params={'alpha': dim - 1,
+                                                          'potential': potential},
                                    deformation_deform_params={'verbose': False},
                                    **kwargs)
         except Exception as error:
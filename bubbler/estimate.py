@@ -0,0 +1,163 @@
+"""
+Thin-wall estimates
+===================
+
+Scales of a bubble from the potential alone, taken along the straight path
+between the vacua. The wall has tension
+
+sigma = int sqrt(2 (V - V_false)) dphi,
+
+and the difference between the vacua is eps = V_false - V_true, so that a
+thin-wall bubble has radius
+
+R = (d - 1) sigma / eps
+
+and action
+
+S = Omega sigma R^(d - 1) / d,
+
+where Omega is the area of the unit sphere. The action is close near the
+thin-wall limit, e.g., within 10% for one_dim_potential(1., 0.501), but
+falls short by orders of magnitude for thick walls, so it only sets
+accuracy budgets where it is large, and never checks results or chooses
+codes.
+
+The wall is about as wide as the time a field rolling in the inverted
+potential takes over the middle half of the path, and outside the bubble the
+fields fall off over about the inverse of the lightest mass at the false
+vacuum. These scales set domains, grids and first steps for the codes:
+
+>>> from potential import one_dim_potential
+>>> scales = estimate(one_dim_potential(1., 0.55))
+>>> print scales.radius, scales.width, scales.tail, scales.action
+>>> print scales.domain, scales.points(), scales.step
+"""
+
+from collections import namedtuple
+import numpy as np
+from scipy.special import gamma
+
+
+N_PATH = 200
+TAILS = 20.
+WALL_TAILS = 2.
+POINTS_PER_WIDTH = 20
+MIN_POINTS = 100
+MAX_POINTS = 10000
+ACCURACY = 0.1
+MIN_RTOL = 1E-7
+
+
+class Estimate(namedtuple('Estimate', ['radius', 'width', 'tail', 'action'])):
+    """
+    Radius of bubble, width of wall, length over which fields fall off
+    outside it and action, in the thin-wall approximation.
+    """
+    @property
+    def thin(self):
+        """
+        :returns: Whether the wall is thin compared to the bubble
+        """
+        return self.radius > self.width
+
+    @property
+    def size(self):
+        """
+        :returns: Radius, or width of wall if larger, as the bubble can't be
+        smaller than its wall
+        """
+        return max(self.radius, self.width)
+
+    @property
+    def domain(self):
+        """
+        :returns: End of a domain of rho that holds the bubble and its tail
+        """
+        return self.size + TAILS * self.tail
+
+    def points(self, per_width=POINTS_PER_WIDTH, low=MIN_POINTS, high=MAX_POINTS):
+        """
+        :param per_width: Number of grid points across the wall
+        :returns: Number of grid points on the domain
+        """
+        return int(np.clip(np.ceil(per_width * self.domain / self.width), low, high))
+
+    def rtol(self, default, accuracy=ACCURACY, low=MIN_RTOL):
+        """
+        :param default: Relative tolerance on action otherwise used
+        :param accuracy: Absolute error in action to aim for
+        :returns: Relative tolerance on action, tighter than the default for
+        large actions, as the decay rate goes as exp(-S) so that only the
+        absolute error in S matters
+        """
+        return float(np.clip(accuracy / self.action, low, default))
+
+    @property
+    def step(self):
+        """
+        :returns: First step for an integrator, a fraction of the wall
+        """
+        return self.width / POINTS_PER_WIDTH
+
+def estimate(potential, dim=3, n_path=N_PATH):
+    """
+    :param potential: Potential object
+    :param dim: Number of dimensions
+    :param n_path: Number of points on path between vacua
+    :returns: Thin-wall estimates of scales and action of bubble
+    :rtype: Estimate
+    """
+    true = np.asarray(potential.true_vacuum, dtype=float)
+    false = np.asarray(potential.false_vacuum, dtype=float)
+    distance = np.sqrt(np.sum((false - true)**2))
+
+    fraction = np.linspace(0., 1., n_path)
+    path = true + np.outer(fraction, false - true)
+    V_false = potential.vector_potential(false)
+    above = np.clip(potential.vector_potential(path) - V_false, 0., None)
+    eps = V_false - potential.vector_potential(true)
+
+    if eps <= 0.:
+        raise ValueError("True vacuum is not below false vacuum")
+
+    tension = np.trapz(np.sqrt(2. * above), fraction * distance)
+    radius = (dim - 1.) * tension / eps
+    omega = 2. * np.pi**(0.5 * dim) / gamma(0.5 * dim)
+    action = omega * tension * radius**(dim - 1) / dim
+
+    # Fall-off from lightest mass at false vacuum, and width of a thin wall
+    # from the middle half of the path, which is never much wider than the
+    # fall-off, as the fields change at least as quickly near the wall as in
+    # its tail
+
+    mass2 = np.min(np.linalg.eigvalsh(potential.vector_hessian(false)))
+    tail = 1. / np.sqrt(mass2) if mass2 > 0. else np.inf
+
+    middle = (fraction >= 0.25) & (fraction <= 0.75)
+
+    with np.errstate(divide="ignore"):
+        width = np.trapz(1. / np.sqrt(2. * above[middle]), fraction[middle] * distance)
+
+    width = min(width, WALL_TAILS * tail)
+
+    if np.isinf(width):
+        raise ValueError("No scale for wall between vacua")
+
+    tail = tail if np.isfinite(tail) else width
+
+    return Estimate(radius, width, tail, action)
+
+def scales(potential, dim=3):
+    """
+    :returns: Thin-wall estimates, or None if the potential gives none, in
+    which case codes fall back to their defaults
+    :rtype: Estimate
+    """
+    try:
+        return estimate(potential, dim)
+    except (ValueError, np.linalg.LinAlgError):
+        return None
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
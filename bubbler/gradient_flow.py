@@ -0,0 +1,283 @@
+"""
+Gradient flow for multi-field potentials
+========================================
+
+The method of SimpleBounce (arXiv:1907.02417), in this process with NumPy.
+With the false vacuum at zero potential, the bounce minimises the kinetic
+integral
+
+T = Omega int r^(d-1) |phi'|^2 / 2 dr
+
+at fixed potential integral V < 0. Starting from a wall between the vacua,
+the fields flow by
+
+d phi / d tau = laplacian(phi) - lambda * grad V(phi),
+
+with lambda chosen at each step so that V is unchanged, until
+laplacian(phi) = lambda * grad V(phi). The bounce is then phi(rho / sqrt(lambda))
+and its action
+
+S = (2 / d) lambda^((d - 2) / 2) T.
+
+The radial Laplacian is taken implicitly and the gradient of the potential
+explicitly, so that steps in tau needn't be as small as the square of the
+spacing of the grid. The fields are fixed at the false vacuum at the end of
+the grid; if the tail of the bubble doesn't fit, the fields are squeezed
+towards the centre, which makes V smaller, and flowed again.
+
+>>> ginac_potential = "(x^2 + y^2) * (1.8 * (x - 1)^2 + 0.2 * (y - 1)^2 - 0.3)"
+>>> from potential import Potential
+>>> print solve(Potential(ginac_potential))[0]
+"""
+
+import numpy as np
+from scipy.linalg import solve_banded
+from scipy.special import gamma
+
+from estimate import scales
+from timer import clock
+from trajectory import Trajectory
+
+
+N = 100
+MAX_POINTS = 1000
+WALLS = [0.5, 0.6, 0.7, 0.8, 0.9]
+WIDTH = 0.05
+CHECK = 20
+SAFETY = 0.5
+ROUGH = 1E-3
+TAIL = 1E-3
+TAIL_AT = 0.8
+SQUEEZE = 0.6
+MAX_SQUEEZE = 20
+
+
+class Flow(object):
+    """
+    Gradient flow of fields on a radial grid.
+    """
+    def __init__(self, potential, dim=3, n=100, rmax=1.):
+        """
+        :param potential: Potential object
+        :param dim: Number of dimensions
+        :param n: Number of grid points
+        :param rmax: Maximum radius, where fields are fixed at false vacuum
+        """
+        self.potential = potential
+        self.dim = dim
+        self.n = n
+        self.true = np.asarray(potential.true_vacuum, dtype=float)
+        self.false = np.asarray(potential.false_vacuum, dtype=float)
+        self.V_false = potential.vector_potential(self.false)
+
+        # Grid and volume of cell around each point
+
+        self.dr = rmax / (n - 1.)
+        self.r = np.linspace(0., rmax, n)
+        self.volume = self.r**(dim - 1) * self.dr
+        self.volume[0] = (0.5 * self.dr)**dim / dim
+
+        # Laplacian from differences of fluxes through faces of cells
+
+        face = (self.r[:-1] + 0.5 * self.dr)**(dim - 1) / self.dr
+        self.face = face
+        self.upper = face / self.volume[:-1]
+        self.lower = np.concatenate(([0.], face[:-1] / self.volume[1:-1]))
+
+    def laplacian(self, phi):
+        """
+        :param phi: Fields on grid, of shape (n, n_fields)
+        :returns: Radial Laplacian at all but the last point
+        :rtype: array
+        """
+        diff = np.diff(phi, axis=0)
+        flux = self.face[:, np.newaxis] * diff
+        out = flux.copy()
+        out[1:] -= flux[:-1]
+        return out / self.volume[:-1, np.newaxis]
+
+    def kinetic(self, phi):
+        """
+        :returns: Kinetic integral, without solid angle
+        """
+        diff = np.diff(phi, axis=0)
+        return 0.5 * np.sum(self.face * np.sum(diff**2, axis=1))
+
+    def potential_integral(self, phi):
+        """
+        :returns: Potential integral, without solid angle
+        """
+        V = self.potential.vector_potential(phi) - self.V_false
+        return np.sum(self.volume * V)
+
+    def wall(self, frac, width=WIDTH):
+        """
+        :returns: Fields with a wall between true vacuum inside and false
+        vacuum outside
+        :rtype: array
+        """
+        rmax = self.r[-1]
+        shape = 0.5 * (1. + np.tanh((self.r - frac * rmax) / (width * rmax)))
+        phi = self.true + np.outer(shape, self.false - self.true)
+        phi[-1] = self.false
+        return phi
+
+    def initial(self, hint=None, estimated=None):
+        """
+        :param hint: Trajectory of a bounce for a nearby potential
+        :param estimated: Estimated scales of the bubble
+        :type estimated: Estimate
+        :returns: Starting fields with negative potential integral
+        :rtype: array
+        """
+        starts = []
+
+        if hint is not None and hint.n_fields == len(self.false):
+            phi = hint(self.r / self.r[-1] * hint.rho_end)
+            phi[-1] = self.false
+            starts.append(phi)
+
+        if estimated:
+            starts.append(self.wall(estimated.size / estimated.domain,
+                                    estimated.width / estimated.domain))
+
+        starts += [self.wall(frac) for frac in WALLS]
+
+        for phi in starts:
+            if self.potential_integral(phi) < 0.:
+                return phi
+
+        raise RuntimeError("Gradient flow crashed: no starting wall with negative potential")
+
+    def lambda_(self, gradient, laplacian):
+        """
+        :returns: Multiplier that keeps potential integral fixed
+        """
+        weight = self.volume[:-1, np.newaxis]
+        return np.sum(weight * gradient * laplacian) / np.sum(weight * gradient**2)
+
+    def action(self, lambda_, phi):
+        """
+        :returns: Action of bounce
+        """
+        omega = 2. * np.pi**(0.5 * self.dim) / gamma(0.5 * self.dim)
+        return 2. / self.dim * lambda_**(0.5 * (self.dim - 2.)) * omega * self.kinetic(phi)
+
+    def tail(self, phi):
+        """
+        :returns: Distance in field space from false vacuum near the end of
+        the grid, as a fraction of that at the centre
+        """
+        distance = np.sqrt(np.sum((phi - self.false)**2, axis=1))
+        return distance[int(TAIL_AT * (self.n - 1))] / distance[0]
+
+    def squeeze(self, phi):
+        """
+        :returns: Fields moved towards the centre, leaving more room for
+        their tail
+        :rtype: array
+        """
+        return Trajectory(np.column_stack((self.r, phi)))(self.r / SQUEEZE)
+
+    def run(self, phi, tol, max_steps, dtau_max):
+        """
+        :param phi: Starting fields
+        :param tol: Relative change of action, over a check, at which to stop
+        :param max_steps: Maximum number of steps
+        :param dtau_max: Largest step in flow time
+        :returns: Multiplier, fields and action at end of flow, and number of
+        steps taken
+        :rtype: tuple
+
+        The step in flow time is limited by the curvature of the potential,
+        as the gradient of the potential is taken explicitly. After each step,
+        the fields are moved along the gradient to restore the potential
+        integral.
+        """
+        target = self.potential_integral(phi)
+        weight = self.volume[:-1, np.newaxis]
+        curvature = np.max(np.abs(np.linalg.eigvalsh(self.potential.vector_hessian(phi))))
+        bands = np.zeros((3, self.n - 1))
+        action = None
+
+        for step in range(max_steps):
+
+            gradient = self.potential.vector_gradient(phi[:-1])
+            lambda_ = self.lambda_(gradient, self.laplacian(phi))
+
+            if step % CHECK == 0:
+
+                if not np.all(np.isfinite(phi)) or lambda_ <= 0.:
+                    raise RuntimeError("Gradient flow crashed: flow diverged")
+
+                previous, action = action, self.action(lambda_, phi)
+
+                if previous is not None and abs(action - previous) < tol * abs(action):
+                    return lambda_, phi, action, step
+
+                # Banded matrix of (1 - dtau * laplacian) for all but the last
+                # point, which is fixed at the false vacuum
+
+                dtau = min(dtau_max, SAFETY / (lambda_ * curvature))
+                bands[0, 1:] = -dtau * self.upper[:-1]
+                bands[1] = 1. + dtau * (self.upper + self.lower)
+                bands[2, :-1] = -dtau * self.lower[1:]
+                boundary = dtau * self.upper[-1] * self.false
+
+            rhs = phi[:-1] - dtau * lambda_ * gradient
+            rhs[-1] += boundary
+            phi[:-1] = solve_banded((1, 1), bands, rhs, check_finite=False)
+
+            gradient = self.potential.vector_gradient(phi[:-1])
+            missing = target - self.potential_integral(phi)
+            phi[:-1] += missing / np.sum(weight * gradient**2) * gradient
+
+        raise RuntimeError("Gradient flow crashed: no convergence in {} steps".format(max_steps))
+
+def solve(potential, dim=3, n=None, tol=1E-7, max_steps=100000, dtau=None, hint=None,
+          **kwargs):
+    """
+    :param potential: Potential object
+    :param n: Number of grid points, by default enough to resolve the
+    estimated width of the wall, up to a maximum
+    :param tol: Relative change of action, over a few steps, at which to stop
+    :param max_steps: Maximum number of steps in each flow
+    :param dtau: Largest step in flow time, by default twice the spacing of
+    the grid
+    :param hint: Trajectory of a bounce for a nearby potential, from which to
+    start the flow
+    :returns: Action, trajectory of bounce, time taken and extra information
+    :rtype: tuple
+    """
+    with clock() as time:
+
+        estimated = scales(potential, dim)
+
+        if n is None:
+            n = estimated.points(high=MAX_POINTS) if estimated else N
+
+        flow = Flow(potential, dim, n)
+        phi = flow.initial(hint, estimated)
+        dtau = dtau if dtau else 2. * flow.dr
+
+        # Flow roughly and squeeze until the tail of the bubble fits on the
+        # grid, then flow to convergence
+
+        for _ in range(MAX_SQUEEZE):
+            lambda_, phi, action, _ = flow.run(phi, ROUGH, max_steps, dtau)
+            if flow.tail(phi) < TAIL:
+                break
+            phi = flow.squeeze(phi)
+        else:
+            raise RuntimeError("Gradient flow crashed: bubble does not fit on grid")
+
+        lambda_, phi, action, _ = flow.run(phi, tol, max_steps, dtau)
+
+    rho = flow.r * np.sqrt(lambda_)
+    trajectory_data = np.column_stack((rho, phi))
+
+    return action, trajectory_data, time.time, "gradient_flow"
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -25,18 +25,179 @@ Plot a one-dimensional potential:
 Make a one-dimensional potential
 
 >>> one_dim_potential(1., 0.55)
+
+Keep parameters symbolic, so that changing them doesn't repeat the symbolic
+setup:
+
+>>> potential = Potential("-E * ((4. * alpha - 3.) / 2. * f^2 + f^3 - alpha * f^4)",
+...                       true_vacuum=[1.], false_vacuum=[0.],
+...                       parameters={"E": 1., "alpha": 0.55})
+>>> print potential.bind(alpha=0.6)
 """
 
+from collections import OrderedDict
 from sympy.utilities.lambdify import lambdify
-from sympy import diff, sympify, latex
-from sympy.solvers import nsolve, solve
+from sympy.printing.pycode import NumPyPrinter
+from sympy import cse, diff, sympify, latex, Symbol, numbered_symbols
 from sympy.printing.cxxcode import cxxcode
+from scipy.optimize import root
 
 import matplotlib.pyplot as plt
 import numpy as np
 import re
 
 
+MAX_SYMBOLIC = 256
+_SYMBOLIC_CACHE = OrderedDict()
+SEARCH_BOX = 10.
+N_STARTS = 1000
+MAX_NEWTON_STEPS = 100
+ONE_DIM_POTENTIAL = "-E * ((4. * alpha - 3.) / 2. * f^2 + f^3 - alpha * f^4)"
+
+
+def _substitute(string, values, form="({!r})"):
+    """
+    :returns: String with names replaced by numerical values
+    """
+    for name, value in values.iteritems():
+        find = r"(?<!\w){}(?!\w)".format(re.escape(name))
+        string = re.sub(find, form.format(float(value)), string)
+
+    return string
+
+def _compile(field_names, parameters, expressions):
+    """
+    :returns: Function that evaluates expressions at fields of shape
+    (..., n_fields) for values of parameters and writes them into output of
+    shape (..., n_expressions)
+
+    Common subexpressions are evaluated once per call.
+    """
+    dummies = [Symbol("_f{}".format(i)) for i in range(len(field_names))]
+    dummy_parameters = [Symbol("_p{}".format(i)) for i in range(len(parameters))]
+    names = dict(zip(field_names + parameters, dummies + dummy_parameters))
+    expressions = [e.xreplace(names) for e in expressions]
+    replacements, reduced = cse(expressions, symbols=numbered_symbols("_t"))
+    printer = NumPyPrinter()
+
+    lines = ["from __future__ import division",
+             "def evaluate(fields, out, parameters):"]
+    lines += ["    {} = fields[..., {}]".format(d, i) for i, d in enumerate(dummies)]
+    lines += ["    {} = parameters[{}]".format(d, i) for i, d in enumerate(dummy_parameters)]
+    lines += ["    {} = {}".format(t, printer.doprint(e)) for t, e in replacements]
+    lines += ["    out[..., {}] = {}".format(i, printer.doprint(e))
+              for i, e in enumerate(reduced)]
+    lines += ["    return out"]
+
+    namespace = {"numpy": np}
+    exec "\n".join(lines) in namespace
+    return namespace["evaluate"]
+
+class _Symbolic(object):
+    """
+    Parsed expression, gradient and compiled functions for a ginac string.
+    """
+    def __init__(self, ginac_potential, parameter_names=()):
+        """
+        :param ginac_potential: Potential as ginac string
+        :param parameter_names: Names in ginac string that are not fields
+        """
+        self.parameters = [Symbol(n) for n in parameter_names]
+        local = dict(zip(parameter_names, self.parameters))
+        self.sympy_potential = sympify(ginac_potential, locals=local)
+        self.field_names = [f for f in self.sympy_potential.free_symbols
+                            if f not in self.parameters]
+        args = self.field_names + self.parameters
+        self.potential = lambdify(args, self.sympy_potential)
+
+        self.sympy_gradient = [diff(self.sympy_potential, f)
+                               for f in self.field_names]
+        self.gradient_functions = [lambdify(args, gradient)
+                                   for gradient in self.sympy_gradient]
+
+        self.vector_potential = _compile(self.field_names, self.parameters,
+                                         [self.sympy_potential])
+        self.vector_gradient = _compile(self.field_names, self.parameters,
+                                        self.sympy_gradient)
+        self._vector_hessian = None
+        self._scalar_gradient = None
+        self._c_potential = None
+        self._c_gradient = None
+
+        self.potential_latex = "$V = {}$".format(latex(self.sympy_potential))
+        self.field_latex = [latex(n, mode="inline") for n in self.field_names]
+
+    @property
+    def sympy_hessian(self):
+        """
+        :returns: Matrix of second derivatives, built on first use
+        """
+        return [[diff(g, f) for f in self.field_names]
+                for g in self.sympy_gradient]
+
+    @property
+    def vector_hessian(self):
+        """
+        :returns: Compiled Hessian, built on first use
+        """
+        if self._vector_hessian is None:
+            flat = [h for row in self.sympy_hessian for h in row]
+            self._vector_hessian = _compile(self.field_names, self.parameters, flat)
+        return self._vector_hessian
+
+    @property
+    def scalar_gradient(self):
+        """
+        :returns: Gradient functions of floats rather than arrays, which are
+        faster for one point at a time, built on first use
+        """
+        if self._scalar_gradient is None:
+            args = self.field_names + self.parameters
+            self._scalar_gradient = [lambdify(args, g, modules="math")
+                                     for g in self.sympy_gradient]
+        return self._scalar_gradient
+
+    @property
+    def c_potential(self):
+        """
+        :returns: Potential in C format, built on first use
+        """
+        if self._c_potential is None:
+            self._c_potential = cxxcode(self.sympy_potential)
+        return self._c_potential
+
+    @property
+    def c_gradient(self):
+        """
+        :returns: Gradient in C format, built on first use
+        """
+        if self._c_gradient is None:
+            self._c_gradient = [cxxcode(g) for g in self.sympy_gradient]
+        return self._c_gradient
+
+    def build(self):
+        """
+        Build everything that is otherwise built on first use.
+        """
+        return self.vector_hessian, self.scalar_gradient, self.c_potential, self.c_gradient
+
+def _symbolic(ginac_potential, parameter_names=()):
+    """
+    :returns: Symbolic setup for a ginac string, reused if recently built
+    :rtype: _Symbolic
+    """
+    key = (ginac_potential, parameter_names)
+
+    try:
+        symbolic = _SYMBOLIC_CACHE.pop(key)
+    except KeyError:
+        symbolic = _Symbolic(ginac_potential, parameter_names)
+        if len(_SYMBOLIC_CACHE) >= MAX_SYMBOLIC:
+            _SYMBOLIC_CACHE.popitem(last=False)
+
+    _SYMBOLIC_CACHE[key] = symbolic
+    return symbolic
+
 class Potential(object):
     """
     Scalar potential from ginac string.
@@ -45,81 +206,249 @@ class Potential(object):
                  ginac_potential,
                  true_vacuum=None,
                  false_vacuum=None,
-                 polish=True):
+                 polish=True,
+                 parameters=None):
         """
         :param potential: Potential as ginac string
+        :param parameters: Values of parameters named in the ginac string
+        :type parameters: dict
         """
-        self.ginac_potential = ginac_potential
-        self._sympy_potential = sympify(self.ginac_potential)
-        self.field_names = list(self._sympy_potential.free_symbols)
+        self.template = ginac_potential
+        self.parameters = dict(parameters) if parameters else {}
+        self._parameter_names = tuple(sorted(self.parameters))
+        self._parameter_values = tuple(self.parameters[n] for n in self._parameter_names)
+        self.ginac_potential = _substitute(self.template, self.parameters)
+
+        symbolic = _symbolic(self.template, self._parameter_names)
+        self.field_names = symbolic.field_names
         self.field_names_str = map(str, self.field_names)
         self.n_fields = len(self.field_names)
-        self._potential = lambdify(self.field_names, self._sympy_potential)
+        self._potential = symbolic.potential
 
-        self._sympy_gradient = [diff(self._sympy_potential, f)
-                                for f in self.field_names]
-        self._gradient_functions = [lambdify(self.field_names, gradient)
-                                    for gradient in self._sympy_gradient]
+        self._gradient_functions = symbolic.gradient_functions
+        self._symbolic = symbolic
+        self._vector_potential = symbolic.vector_potential
+        self._vector_gradient = symbolic.vector_gradient
+
+        minima = self._solve if true_vacuum is None or false_vacuum is None else None
 
         if polish and true_vacuum is not None:
             self.true_vacuum = self._nsolve(true_vacuum)
         elif true_vacuum is not None:
             self.true_vacuum = np.atleast_1d(true_vacuum)
         else:
-            self.true_vacuum = self._solve[0]
+            self.true_vacuum = minima[0]
 
         if polish and false_vacuum is not None:
             self.false_vacuum = self._nsolve(false_vacuum)
         elif true_vacuum is not None:
             self.false_vacuum = np.atleast_1d(false_vacuum)
         else:
-            self.false_vacuum = self._solve[1]
+            self.false_vacuum = minima[1]
 
-        self.potential_latex = "$V = {}$".format(latex(self._sympy_potential))
-        self.field_latex = [latex(n, mode="inline") for n in self.field_names]
+        self.field_latex = symbolic.field_latex
+
+    def _substitute_parameters(self, expression):
+        """
+        :returns: Symbolic expression with numerical values of parameters
+        """
+        if not self.parameters:
+            return expression
+        return expression.subs(zip(self._symbolic.parameters, self._parameter_values))
+
+    @property
+    def _sympy_potential(self):
+        """
+        :returns: Symbolic potential
+        """
+        return self._substitute_parameters(self._symbolic.sympy_potential)
+
+    @property
+    def _sympy_gradient(self):
+        """
+        :returns: Symbolic gradient of potential
+        """
+        return [self._substitute_parameters(g) for g in self._symbolic.sympy_gradient]
+
+    @property
+    def potential_latex(self):
+        """
+        :returns: Potential in LaTeX format
+        """
+        if not self.parameters:
+            return self._symbolic.potential_latex
+        return "$V = {}$".format(latex(self._sympy_potential))
 
     def _nsolve(self, guess):
         """
         :returns: Numerical solution to tapdole equations
         """
-        sol = nsolve(self._sympy_gradient, self.field_names, guess)
-        return np.array([float(s) for s in sol])
+        guess = np.atleast_1d(guess).astype(float)
+        sol = root(self.vector_gradient, guess, jac=self.vector_hessian)
+        if not sol.success:
+            raise ValueError("Could not find extremum near {}: {}".format(guess, sol.message))
+        return sol.x
+
+    def bind(self, true_vacuum=None, false_vacuum=None, polish=True, **values):
+        """
+        :param values: New values of parameters
+        :returns: Potential of the same form with new values of parameters
+
+        The symbolic setup is shared, so only numerical values change. By
+        default, the vacua are found near those of this potential.
+        """
+        unknown = set(values) - set(self.parameters)
+        if unknown:
+            raise ValueError("Unknown parameters: {}".format(", ".join(sorted(unknown))))
+
+        true_vacuum = self.true_vacuum if true_vacuum is None else true_vacuum
+        false_vacuum = self.false_vacuum if false_vacuum is None else false_vacuum
+        parameters = dict(self.parameters, **values)
+
+        return Potential(self.template, true_vacuum, false_vacuum, polish, parameters)
 
     @property
     def _solve(self):
         """
-        :returns: Analytic solution to tapdole equations
+        :returns: Numerical solution for two lowest minima
+        """
+        minima = self.minima()
+        if len(minima) < 2:
+            raise ValueError("Found {} minima; cannot pick true and false vacua".format(len(minima)))
+        return minima
+
+    def _newton(self, fields):
+        """
+        :param fields: Starting points of shape (n_starts, n_fields)
+        :returns: Points reached by saddle-free Newton iterations and whether
+        they converged
+
+        The step uses the absolute values of the eigenvalues of the Hessian, so
+        that iterations move downhill towards minima rather than to saddles.
         """
-        extrema = solve(self._sympy_gradient, self.field_names, dict=True)
-        assert len(extrema) >= 3
-        extrema = sorted(extrema, key=self._sympy_potential.subs)
-        return [np.array([extreme[n] for n in self.field_names]).astype(float)
-                for extreme in extrema]
+        fields = np.array(fields, dtype=float)
+        converged = np.zeros(len(fields), dtype=bool)
+        max_step = 0.1 * max(np.abs(fields).max(), 1.)
+
+        for _ in range(MAX_NEWTON_STEPS):
+
+            active = ~converged
+            if not active.any():
+                break
+
+            x = fields[active]
+            gradient = self.vector_gradient(x)
+            eigenvalues, eigenvectors = np.linalg.eigh(self.vector_hessian(x))
+            scale = np.maximum(np.abs(eigenvalues), 1E-12)
+            projected = np.einsum('...ji,...j->...i', eigenvectors, gradient) / scale
+            step = -np.einsum('...ij,...j->...i', eigenvectors, projected)
+
+            norm = np.sqrt(np.sum(step**2, axis=-1))
+            step *= np.minimum(1., max_step / np.maximum(norm, 1E-300))[:, np.newaxis]
+
+            fields[active] = x + step
+            converged[active] = norm < 1E-10 * (1. + np.sqrt(np.sum(x**2, axis=-1)))
+
+        return fields, converged
+
+    def minima(self, box=SEARCH_BOX, n_starts=N_STARTS, seed=0):
+        """
+        :param box: Half-width of region around the origin where searches start
+        :param n_starts: Number of starting points
+        :param seed: Seed for sampling starting points
+        :returns: Minima of the potential, ordered by value of the potential
+        :rtype: list of arrays
+
+        Minima are found by Newton iterations from many points at once,
+        deduplicated and classified by the eigenvalues of the Hessian.
+        """
+        random = np.random.RandomState(seed)
+        starts = random.uniform(-box, box, (n_starts, self.n_fields))
+        fields, converged = self._newton(starts)
+        fields = fields[converged & np.all(np.isfinite(fields), axis=-1)]
+
+        # Remove duplicates
+
+        unique = []
+
+        for point in fields:
+            tol = 1E-6 * (1. + np.sqrt(np.sum(point**2)))
+            if all(np.sqrt(np.sum((point - u)**2)) > tol for u in unique):
+                unique.append(point)
+
+        if not unique:
+            return []
+
+        # Keep minima, i.e., positive-definite Hessian
+
+        unique = np.array(unique)
+        eigenvalues = np.linalg.eigvalsh(self.vector_hessian(unique))
+        minima = unique[np.all(eigenvalues > 0., axis=-1)]
+        order = np.argsort(self.vector_potential(minima))
+
+        return list(minima[order])
 
     def gradient(self, *fields):
         """
         :returns: Gradient of potential
         """
-        return np.array([gradient(*fields)
+        args = fields + self._parameter_values
+        return np.array([gradient(*args)
                          for gradient in self._gradient_functions])
 
+    def vector_potential(self, fields, out=None):
+        """
+        :param fields: Fields of shape (..., n_fields)
+        :param out: Optional output of shape (...)
+        :returns: Potential of shape (...)
+        """
+        fields = np.asarray(fields, dtype=float)
+        out = np.empty(fields.shape[:-1]) if out is None else out
+        self._vector_potential(fields, out[..., np.newaxis], self._parameter_values)
+        return out if out.ndim else out[()]
+
+    def vector_gradient(self, fields, out=None):
+        """
+        :param fields: Fields of shape (..., n_fields)
+        :param out: Optional output of shape (..., n_fields)
+        :returns: Gradient of potential of shape (..., n_fields)
+        """
+        fields = np.asarray(fields, dtype=float)
+        out = np.empty(fields.shape) if out is None else out
+        return self._vector_gradient(fields, out, self._parameter_values)
+
+    def vector_hessian(self, fields, out=None):
+        """
+        :param fields: Fields of shape (..., n_fields)
+        :param out: Optional contiguous output of shape (..., n_fields, n_fields)
+        :returns: Hessian of potential of shape (..., n_fields, n_fields)
+        """
+        fields = np.asarray(fields, dtype=float)
+        shape = fields.shape[:-1]
+        out = np.empty(shape + (self.n_fields, self.n_fields)) if out is None else out
+        self._symbolic.vector_hessian(fields, out.reshape(shape + (-1,)),
+                                      self._parameter_values)
+        return out
+
     def __call__(self, *fields):
         """
         :returns: Potential
         """
-        return self._potential(*fields)
+        return self._potential(*(fields + self._parameter_values))
 
-    def names_to_array(self, string, array_name="q", zero_based=True):
+    def names_to_array(self, string, array_name="q", zero_based=True, names=None):
         """
-        :returns: String with field names replaced by an indexed array
+        :returns: String with field names, or other names, replaced by an
+        indexed array
         """
         shift = 0 if zero_based else 1
+        names = self.field_names_str if names is None else names
 
-        for i, name in enumerate(self.field_names_str):
+        for i, name in enumerate(names):
             if array_name in name:
                 raise ValueError("Field name cannot contain {}".format(array_name))
-            find = r"(\W)({})(\W)".format(name)
-            replace = r"\1{}[{}]\3".format(array_name, i + shift)
+            find = r"(?<!\w){}(?!\w)".format(re.escape(name))
+            replace = "{}[{}]".format(array_name, i + shift)
             string = re.sub(find, replace, string)
 
         return string
@@ -129,23 +458,66 @@ class Potential(object):
         """
         @returns Potential in Mathematica format
         """
-        return self.names_to_array(self.ginac_potential, zero_based=False)
+        numbers = _substitute(self.template, self.parameters)
+        numbers = re.sub(r"(\d)e([+-]?\d)", r"\1*^\2", numbers)
+        return self.names_to_array(numbers, zero_based=False)
+
+    def _c_code(self, code, parametric=False):
+        """
+        :returns: C code with fields in an array, and parameters either as
+        numbers or in an array
+        """
+        code = self.names_to_array(code)
+
+        if parametric:
+            return self.names_to_array(code, "params", names=self._parameter_names)
+
+        return _substitute(code, self.parameters)
 
     @property
     def c_potential(self):
         """
         @returns Potential in C format
         """
-        return self.names_to_array(cxxcode(self.ginac_potential))
+        return self._c_code(self._symbolic.c_potential)
 
     @property
     def c_gradient(self, pattern="dvdq[{}] = {};"):
         """
         @returns Gradient in very particlar C format
         """
-        lines = [pattern.format(i, cxxcode(g)) for i, g in enumerate(self._sympy_gradient)]
-        joined = "\n".join(lines)
-        return self.names_to_array(joined)
+        lines = [pattern.format(i, g) for i, g in enumerate(self._symbolic.c_gradient)]
+        return self._c_code("\n".join(lines))
+
+    @property
+    def c_parametric_potential(self):
+        """
+        @returns Potential in C format with parameters in array params
+        """
+        return self._c_code(self._symbolic.c_potential, parametric=True)
+
+    @property
+    def c_parametric_gradient(self, pattern="dvdq[{}] = {};"):
+        """
+        @returns Gradient in C format with parameters in array params
+        """
+        lines = [pattern.format(i, g) for i, g in enumerate(self._symbolic.c_gradient)]
+        return self._c_code("\n".join(lines), parametric=True)
+
+    @property
+    def parameter_values(self):
+        """
+        @returns Values of parameters in the order of array params
+        """
+        return np.array(self._parameter_values, dtype=float)
+
+    def build(self):
+        """
+        Build everything that codes otherwise build on first use, so that
+        codes in threads needn't build it at the same time, nor fork while
+        another thread is part way through building it.
+        """
+        self._symbolic.build()
 
     def plot(self):
         """
@@ -161,6 +533,13 @@ class Potential(object):
     def __str__(self):
         return self.ginac_potential
 
+    def __reduce__(self):
+        """
+        :returns: Arguments that rebuild this potential, e.g., in another process
+        """
+        return (Potential, (self.template, self.true_vacuum, self.false_vacuum, False,
+                            self.parameters))
+
 class one_dim_potential(Potential):
     """
     One-dimensional potential
@@ -178,11 +557,16 @@ class one_dim_potential(Potential):
         self.E = E
         self.alpha = alpha
 
-        potential = "-{1} * ((4. * {0} - 3.) / 2. * f^2 + f^3 - {0} * f^4)".format(alpha, E)
-
-        super(one_dim_potential, self).__init__(potential,
+        super(one_dim_potential, self).__init__(ONE_DIM_POTENTIAL,
                                                 true_vacuum=[1.],
-                                                false_vacuum=[0.])
+                                                false_vacuum=[0.],
+                                                parameters={"E": E, "alpha": alpha})
+
+    def __reduce__(self):
+        """
+        :returns: Arguments that rebuild this potential, e.g., in another process
+        """
+        return (one_dim_potential, (self.E, self.alpha))
 
 if __name__ == "__main__":
     import doctest
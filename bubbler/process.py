@@ -0,0 +1,261 @@
+"""
+Time limits for codes
+=====================
+
+External codes are started in their own process group, so that, when their
+time is up, the shell, the code and anything that it started are killed
+together:
+
+>>> print run("sleep 10; echo done", timeout=1.)
+
+Codes that run in this process are called in a forked child instead, which is
+killed in the same way, and whose result is pickled back through a pipe:
+
+>>> print call(sum, ([1, 2, 3],), timeout=1.)
+
+A thread can instead be cancelled from another, which kills everything that
+it started:
+
+>>> cancel = Cancel()
+>>> with cancel:
+...     run("sleep 10")  # cancel.cancel() from another thread stops this
+"""
+
+import os
+import select
+import signal
+import time
+import threading
+import cPickle as pickle
+from subprocess32 import Popen, PIPE, TimeoutExpired, CalledProcessError
+
+
+CHUNK = 2**16
+_THREAD = threading.local()
+
+
+class TimedOut(RuntimeError):
+    """
+    A code ran out of time.
+    """
+
+class Cancel(object):
+    """
+    Processes started by a thread, killed together when cancelled. Inside
+    "with cancel:", every process that a code starts is watched, and codes
+    that run in this process are run in a forked child so that they can be
+    killed too.
+    """
+    def __init__(self):
+        """
+        """
+        self.cancelled = False
+        self.pids = set()
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        """
+        """
+        _THREAD.cancel = self
+        return self
+
+    def __exit__(self, *args):
+        """
+        """
+        _THREAD.cancel = None
+
+    def register(self, pid):
+        """
+        Watch a process group, killed at once if already cancelled.
+        """
+        with self.lock:
+            if self.cancelled:
+                kill(pid)
+            else:
+                self.pids.add(pid)
+
+    def unregister(self, pid):
+        """
+        Stop watching a process group.
+        """
+        with self.lock:
+            self.pids.discard(pid)
+
+    def cancel(self):
+        """
+        Kill every process group being watched, and any started later.
+        """
+        with self.lock:
+            self.cancelled = True
+            for pid in self.pids:
+                kill(pid)
+            self.pids.clear()
+
+def current():
+    """
+    :returns: Cancel for this thread, if any
+    :rtype: Cancel
+    """
+    return getattr(_THREAD, "cancel", None)
+
+def register(pid):
+    """
+    Watch a process group, if this thread can be cancelled.
+    """
+    if current() is not None:
+        current().register(pid)
+
+def unregister(pid):
+    """
+    Stop watching a process group.
+    """
+    if current() is not None:
+        current().unregister(pid)
+
+def kill(pid):
+    """
+    Kill a process group, or the process if it didn't lead a group yet.
+    """
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+def run(command, timeout=None):
+    """
+    :param command: Shell command
+    :param timeout: Time limit in seconds, or None for no limit
+    :returns: Standard output of command
+    :rtype: str
+    """
+    process = Popen(command, shell=True, stdout=PIPE, start_new_session=True)
+    register(process.pid)
+
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except TimeoutExpired:
+        kill(process.pid)
+        process.wait()
+        raise TimedOut("{} timed out after {} s".format(command.split()[0], timeout))
+    except BaseException:
+        kill(process.pid)
+        process.wait()
+        raise
+    finally:
+        unregister(process.pid)
+
+    if process.returncode:
+        raise CalledProcessError(process.returncode, command, output=output)
+
+    return output
+
+def read(fd, end=None, deadline=None):
+    """
+    :param fd: File descriptor to read from
+    :param end: Function of the output so far that says whether it is
+    complete, else read until end of file
+    :param deadline: Time by which output must be complete
+    :returns: Output, and whether it ended before the deadline
+    :rtype: tuple
+    """
+    chunks = []
+
+    while True:
+        if deadline is not None:
+            left = deadline - time.time()
+            if left <= 0. or not select.select([fd], [], [], left)[0]:
+                return "".join(chunks), False
+
+        chunk = os.read(fd, CHUNK)
+
+        if not chunk:
+            return "".join(chunks), True
+
+        chunks.append(chunk)
+
+        if end is not None and end(chunks):
+            return "".join(chunks), True
+
+def call(function, args=(), kwargs=None, timeout=None, name=None):
+    """
+    :param function: Function to call
+    :param timeout: Time limit in seconds, or None to call it in this process,
+    unless this thread can be cancelled
+    :param name: Name of code for messages, by default that of the function
+    :returns: What the function returns, or raises what it raises
+
+    The child has only the thread that forked it, so anything that the
+    function builds lazily must be built beforehand if other threads run.
+    """
+    kwargs = kwargs if kwargs else {}
+    name = name if name else function.__name__
+
+    if timeout is None and current() is None:
+        return function(*args, **kwargs)
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+
+        # Child leads its own group, answers and leaves without cleaning up
+        # anything that belongs to the parent
+
+        try:
+            os.close(read_end)
+            os.setpgid(0, 0)
+
+            try:
+                answer = (True, function(*args, **kwargs))
+            except Exception as error:
+                answer = (False, error)
+
+            try:
+                data = pickle.dumps(answer, pickle.HIGHEST_PROTOCOL)
+            except Exception as error:
+                data = pickle.dumps((False, RuntimeError(str(error))), pickle.HIGHEST_PROTOCOL)
+
+            with os.fdopen(write_end, "wb") as f:
+                f.write(data)
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+
+    register(pid)
+    deadline = time.time() + timeout if timeout is not None else None
+    finished = False
+
+    try:
+        data, finished = read(read_end, deadline=deadline)
+    finally:
+        os.close(read_end)
+        if not finished:
+            kill(pid)
+        status = os.waitpid(pid, 0)[1]
+        unregister(pid)
+
+    if not finished:
+        raise TimedOut("{} timed out after {} s".format(name, timeout))
+
+    if not data or os.WIFSIGNALED(status):
+        raise RuntimeError("{} stopped without an answer".format(name))
+
+    ok, value = pickle.loads(data)
+
+    if not ok:
+        raise value
+
+    return value
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
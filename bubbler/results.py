@@ -0,0 +1,68 @@
+"""
+Read results from codes
+=======================
+
+Codes write profiles as rows of whitespace-separated numbers, followed by a
+line with the action and possibly the time taken, or by a line starting
+"error". These are parsed in one pass, straight from the text read from a pipe.
+
+>>> read_result("0. 1.\\n1. 0.5\\n2. 0.\\n52.5 0.1\\n")
+"""
+
+import re
+import numpy as np
+
+
+COMMENT = re.compile(r"^[ \t]*#.*(\n|$)", re.MULTILINE)
+
+
+def read_table(text, comments=True):
+    """
+    :param text: Rows of whitespace-separated numbers
+    :param comments: Whether to skip lines starting with #
+    :returns: Table of numbers
+    :rtype: array
+    """
+    if comments and "#" in text:
+        text = COMMENT.sub("", text)
+
+    if "*^" in text:
+        text = text.replace("*^", "e")
+
+    text = text.strip()
+
+    if not text:
+        raise ValueError("No rows of numbers")
+
+    n_columns = len(text[:text.find("\n")].split()) if "\n" in text else len(text.split())
+    table = np.fromstring(text, sep=" ")
+
+    if table.size % n_columns:
+        raise ValueError("Rows of numbers are ragged or not numeric")
+
+    return table.reshape(-1, n_columns)
+
+def read_result(text, header=0):
+    """
+    :param text: Output of a code
+    :param header: Number of lines to skip before the rows
+    :returns: Table of rows and numbers on last line
+    :rtype: tuple
+    """
+    if "*^" in text:
+        text = text.replace("*^", "e")
+
+    body, _, last = text.rstrip().rpartition("\n")
+
+    if last.startswith("error"):
+        raise RuntimeError(last[len("error"):].strip() or "unknown error")
+
+    if header:
+        body = body.split("\n", header)[-1] if body.count("\n") >= header else ""
+
+    numbers = [float(x) for x in last.split()]
+    return read_table(body), numbers
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,143 @@
+"""
+Long-lived processes for external codes
+=======================================
+
+A session keeps a code running, writes jobs to its input and reads results
+from its output up to an end marker, so that a scan pays for starting the code
+once.
+
+>>> print session(["cat"]).send("1 2 3\\nend\\n")
+"""
+
+import os
+import time
+import threading
+from subprocess32 import Popen, PIPE
+
+from process import TimedOut, kill, read, register, unregister
+
+
+END = "end"
+_SESSIONS = {}
+
+
+class Session(object):
+    """
+    Long-lived process that answers jobs written to its input.
+    """
+    def __init__(self, command, end=END):
+        """
+        :param command: Command that starts the process
+        :type command: list
+        :param end: Line that ends the output for each job
+        """
+        self.command = list(command)
+        self.end = end + "\n"
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.process = Popen(self.command, stdin=PIPE, stdout=PIPE, bufsize=0,
+                             start_new_session=True)
+
+    @property
+    def alive(self):
+        """
+        :returns: Whether process is running and was started by this process
+        """
+        return self.pid == os.getpid() and self.process.poll() is None
+
+    def _ended(self, chunks):
+        """
+        :param chunks: Output so far
+        :returns: Whether output ends with the end marker on its own line
+        """
+        tail = ""
+
+        for chunk in reversed(chunks):
+            tail = chunk + tail
+            if len(tail) > len(self.end):
+                break
+
+        return tail.endswith(self.end) and \
+            (len(tail) == len(self.end) or tail[-len(self.end) - 1] == "\n")
+
+    def send(self, job, timeout=None):
+        """
+        :param job: Input for a job, including its final newline
+        :param timeout: Time limit in seconds, or None for no limit
+        :returns: Output for the job, without the end marker
+        :rtype: str
+
+        Output is read from the pipe in large chunks until it ends with the
+        end marker, as nothing follows the marker until the next job. A job
+        that runs out of time kills the process, which is started again for
+        the next job.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        fd = self.process.stdout.fileno()
+
+        with self.lock:
+            register(self.process.pid)
+            try:
+                self.process.stdin.write(job)
+                self.process.stdin.flush()
+                output, finished = read(fd, self._ended, deadline)
+            finally:
+                unregister(self.process.pid)
+
+        if not finished:
+            self.kill()
+            raise TimedOut("{} timed out after {} s".format(self.command[0], timeout))
+
+        if not self._ended([output]):
+            self.close()
+            raise RuntimeError("{} stopped before finishing a job".format(self.command[0]))
+
+        return output[:-len(self.end)]
+
+    def kill(self):
+        """
+        Kill the process and anything that it started.
+        """
+        if _SESSIONS.get(tuple(self.command)) is self:
+            del _SESSIONS[tuple(self.command)]
+
+        if self.pid == os.getpid():
+            kill(self.process.pid)
+            self.process.wait()
+
+    def close(self):
+        """
+        Stop the process.
+        """
+        if _SESSIONS.get(tuple(self.command)) is self:
+            del _SESSIONS[tuple(self.command)]
+
+        if self.pid != os.getpid():
+            return
+
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+
+        self.process.wait()
+
+def session(command, end=END, cls=Session, **kwargs):
+    """
+    :param command: Command that starts the process
+    :type command: list
+    :param kwargs: Extra arguments for starting a session of this class
+    :returns: Running session for a command, started if necessary
+    :rtype: Session
+    """
+    key = tuple(command)
+    running = _SESSIONS.get(key)
+
+    if running is None or not running.alive:
+        running = _SESSIONS[key] = cls(command, end, **kwargs)
+
+    return running
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
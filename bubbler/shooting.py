@@ -0,0 +1,761 @@
+"""
+Shooting for single-field potentials
+====================================
+
+Overshoot/undershoot shooting, in this process, with an adaptive
+Runge-Kutta integrator (dopri5). The field at the centre of the bubble is
+
+phi(0) = true vacuum + (edge - true vacuum) * exp(-x),
+
+where the potential at the edge equals that at the false vacuum. Each shot
+stops when the field overshoots the false vacuum or turns back before
+reaching it, and the energy
+
+E = phi'^2 / 2 - V(phi) + V(false vacuum)
+
+at that point is positive or negative, respectively. The bounce is at the
+root of E(x). Close to the centre the field is found from the equation of
+motion linearised about phi(0), so that thin-wall bubbles, which sit close to
+the true vacuum for a long time, start where the field begins to move. The
+first x is that expected for a thin wall.
+
+>>> ginac_potential = "0.1*((-x + 2)^4 - 14*(-x + 2)^2 + 24*(-x + 2))"
+>>> from potential import Potential
+>>> print solve(Potential(ginac_potential))[0]
+"""
+
+import numpy as np
+from scipy.integrate import ode
+from scipy.optimize import brentq
+from scipy.special import gamma, iv, jv
+
+from estimate import scales
+from timer import clock
+
+
+N_POINTS = 1000
+N_BARRIER = 200
+START = 1E-4
+MAX_BRACKET = 100
+MAX_STEPS = 100000
+MAX_BISECT = 60
+MAX_ROOT = 200
+
+
+def _exact(r, dV0, d2V0, dim):
+    """
+    :returns: Change in field from centre and its derivative at radius r,
+    from the equation of motion linearised about the centre
+
+    Arguments may be arrays, which are broadcast together.
+    """
+    r, dV0, d2V0 = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (r, dV0, d2V0)])
+    nu = 0.5 * (dim - 2.)
+    flat = (np.abs(d2V0) < 1E-12 * np.maximum(np.abs(dV0), 1E-300)) | (r == 0.)
+
+    beta = np.sqrt(np.abs(d2V0))
+    x = np.where(flat, 1., beta * r)
+    d2V0 = np.where(flat, 1., d2V0)
+
+    with np.errstate(over="ignore", invalid="ignore"):
+        scale = gamma(nu + 1.) * (2. / x)**nu
+        f = np.where(d2V0 > 0., scale * iv(nu, x), scale * jv(nu, x))
+        df = np.where(d2V0 > 0., scale * iv(nu + 1., x), -scale * jv(nu + 1., x))
+        change = np.where(flat, dV0 * r**2 / (2. * dim), dV0 / d2V0 * (f - 1.))
+        derivative = np.where(flat, dV0 * r / dim, dV0 / d2V0 * beta * df)
+
+    return change, derivative
+
+def _hermite(t, y, dy, t_new):
+    """
+    :returns: Cubic Hermite interpolation of y, with derivative dy, on t
+    """
+    i = np.clip(np.searchsorted(t, t_new) - 1, 0, len(t) - 2)
+    h = t[i + 1] - t[i]
+    s = (t_new - t[i]) / h
+    return ((2. * s**3 - 3. * s**2 + 1.) * y[i] + (s**3 - 2. * s**2 + s) * h * dy[i] +
+            (-2. * s**3 + 3. * s**2) * y[i + 1] + (s**3 - s**2) * h * dy[i + 1])
+
+def _radius(potential, dim):
+    """
+    :returns: Radius of a thin-wall bubble, from the estimate or, if the
+    potential gives none, e.g., without a barrier, from the tension alone
+    """
+    estimated = scales(potential, dim)
+
+    if estimated:
+        return estimated.radius
+
+    true, false = potential.true_vacuum[0], potential.false_vacuum[0]
+    V_false = potential(false)
+    phi = np.linspace(true, false, N_BARRIER)
+    V = potential.vector_potential(phi[:, np.newaxis])
+    tension = np.trapz(np.sqrt(2. * np.clip(V - V_false, 0., None)), phi) * np.sign(false - true)
+    return (dim - 1.) * tension / (V_false - potential(true))
+
+class Shooter(object):
+    """
+    Shots from the centre of a bubble in a single-field potential.
+    """
+    def __init__(self, potential, dim=3, rtol=1E-7):
+        """
+        :param potential: Potential object with one field
+        :param dim: Number of dimensions
+        :param rtol: Relative tolerance of integrator
+        """
+        if potential.n_fields != 1:
+            raise RuntimeError("Shooting needs one field, not {}".format(potential.n_fields))
+
+        self.potential = potential
+        self.dim = dim
+        self.rtol = rtol
+        self.true = float(potential.true_vacuum[0])
+        self.false = float(potential.false_vacuum[0])
+        self.sign = np.sign(self.false - self.true)
+        self.V_false = potential(self.false)
+
+        if potential(self.true) >= self.V_false:
+            raise RuntimeError("True vacuum is not below false vacuum")
+
+        # Scalar derivative for the integrator, much faster than arrays
+
+        gradient = potential._symbolic.scalar_gradient[0]
+        parameters = potential._parameter_values
+        self.dV = lambda phi: gradient(phi, *parameters)
+
+        # Find barrier and edge, beyond which a shot must undershoot
+
+        phi = np.linspace(self.true, self.false, N_BARRIER)
+        V = potential.vector_potential(phi[:, np.newaxis])
+        self.top = phi[np.argmax(V)]
+        self.edge = brentq(lambda p: potential(p) - self.V_false, self.true, self.top)
+
+        self.scale = np.sqrt(np.max(np.abs(potential.vector_hessian(phi[:, np.newaxis]))))
+        self.mass = np.sqrt(max(self.d2V(self.true), 0.))
+
+    def d2V(self, phi):
+        """
+        :returns: Second derivative of potential
+        """
+        return self.potential.vector_hessian([phi])[0, 0]
+
+    def centre(self, x):
+        """
+        :returns: Distance of field at centre of bubble from true vacuum
+        """
+        return (self.edge - self.true) * np.exp(-x)
+
+    def thin_wall(self):
+        """
+        :returns: Value of x expected for a thin-wall bubble
+        """
+        return max(self.mass * _radius(self.potential, self.dim), 1.)
+
+    def _start(self, delta):
+        """
+        :param delta: Distance of field at centre from true vacuum
+        :returns: Radius, field, derivative and kinetic integral at which to
+        start integrating, once the field has moved away from the centre, and
+        the field on the way there
+
+        Derivatives at the centre are linearised about the true vacuum if
+        the centre is too close to it to be told apart.
+        """
+        target = START * abs(self.edge - self.true)
+
+        if abs(delta) < target:
+            dV0 = self.mass**2 * delta
+            d2V0 = self.mass**2
+        else:
+            dV0 = self.dV(self.true + delta)
+            d2V0 = self.d2V(self.true + delta)
+
+        def moved(r):
+            return abs(_exact(r, dV0, d2V0, self.dim)[0]) - target
+
+        if d2V0 > 0.:
+            r_high = 1. / self.scale
+            while moved(r_high) < 0.:
+                r_high *= 2.
+            r0 = brentq(moved, 0., r_high)
+        else:
+            r0 = np.sqrt(2. * self.dim * target / max(abs(dV0), 1E-300))
+
+        rho = np.linspace(0., r0, 20)
+        change, dphi = np.array([_exact(r, dV0, d2V0, self.dim) for r in rho]).T
+        phi = self.true + delta + change
+        kinetic = np.trapz(0.5 * dphi**2 * rho**(self.dim - 1), rho)
+
+        return r0, phi[-1], dphi[-1], kinetic, (rho, phi)
+
+    def shoot(self, x, record=False):
+        """
+        :param x: Position of centre of bubble
+        :param record: Whether to keep every step of the integrator
+        :returns: Energy where the shot stopped, radius at which it stopped,
+        kinetic integral there, and, if recording, the steps and the field
+        from the linearised equation near the centre
+        :rtype: tuple
+        """
+        r0, phi, dphi, kinetic, exact = self._start(self.centre(x))
+        friction = self.dim - 1.
+        dV = self.dV
+        false, sign = self.false, self.sign
+
+        # At and beyond the false vacuum, where the shot stops anyway, the
+        # gradient is taken to vanish, as the potential may not be defined
+        # there, e.g., for fractional powers of the field
+
+        def rhs(r, y):
+            force = dV(y[0]) if sign * (y[0] - false) < 0. else 0.
+            return [y[1], force - friction / r * y[1], 0.5 * y[1]**2 * r**friction]
+
+        steps = []
+
+        def solout(r, y):
+            steps.append((r, y[0], y[1], y[2]))
+            if sign * (y[0] - false) > 0. or sign * y[1] < 0.:
+                return -1
+            return 0
+
+        tolerance = 1E-12 * abs(false - self.true)
+        integrator = ode(rhs).set_integrator("dopri5", rtol=self.rtol, atol=tolerance,
+                                             nsteps=MAX_STEPS)
+        integrator.set_solout(solout)
+        integrator.set_initial_value([phi, dphi, kinetic], r0)
+
+        try:
+            integrator.integrate(np.inf)
+        except (ArithmeticError, ValueError) as error:
+            raise RuntimeError("Shooting crashed: {}".format(error))
+
+        if not integrator.successful() and len(steps) < 2:
+            raise RuntimeError("Shooting crashed: integrator failed")
+
+        # Stop where field crosses false vacuum or turns back, between the last
+        # two steps
+
+        (r_a, phi_a, dphi_a, T_a), (r_b, phi_b, dphi_b, T_b) = steps[-2:]
+
+        if sign * (phi_b - false) > 0.:
+            w = (false - phi_a) / (phi_b - phi_a)
+        elif sign * dphi_b < 0.:
+            w = dphi_a / (dphi_a - dphi_b)
+        else:
+            raise RuntimeError("Shooting crashed: no overshoot or undershoot")
+
+        r_end = r_a + w * (r_b - r_a)
+        phi_end = phi_a + w * (phi_b - phi_a)
+        dphi_end = dphi_a + w * (dphi_b - dphi_a)
+        T_end = T_a + w * (T_b - T_a)
+
+        energy = 0.5 * dphi_end**2 - self.potential(phi_end) + self.V_false
+
+        if record:
+            return energy, r_end, T_end, np.array(steps[:-1] + [(r_end, phi_end, dphi_end, T_end)]), exact
+
+        return energy, r_end, T_end
+
+    def bracket(self, x):
+        """
+        :param x: First guess
+        :returns: Largest x that undershoots and smallest that overshoots
+        """
+        over = self.shoot(x)[0] > 0.
+        low, high = (None, x) if over else (x, None)
+
+        for _ in range(MAX_BRACKET):
+            if low is not None and high is not None:
+                return low, high
+
+            if over:
+                x *= 0.5
+                if x < 1E-12:
+                    raise RuntimeError("Shooting crashed: overshoots from the edge")
+            else:
+                x = 2. * x + 1.
+                if self.centre(x) == 0.:
+                    raise RuntimeError("Shooting crashed: wall too thin to resolve")
+
+            over = self.shoot(x)[0] > 0.
+
+            if over:
+                high = x
+            else:
+                low = x
+
+        raise RuntimeError("Shooting crashed: could not bracket bounce")
+
+def solve(potential, dim=3, rtol=1E-7, xtol=1E-10, n_points=N_POINTS, hint=None, **kwargs):
+    """
+    :param potential: Potential object with one field
+    :param rtol: Relative tolerance of integrator
+    :param xtol: Tolerance for position of centre of bubble
+    :param n_points: Number of points in trajectory
+    :param hint: Trajectory of a bounce for a nearby potential, from which to
+    guess the field at the centre
+    :returns: Action, trajectory of bounce, time taken and extra information
+    :rtype: tuple
+    """
+    with clock() as time:
+
+        shooter = Shooter(potential, dim, rtol)
+
+        # First guess from hint, or from a thin wall
+
+        if hint is not None:
+            distance = (hint.fields[0, 0] - shooter.true) / (shooter.edge - shooter.true)
+            guess = -np.log(distance) if 0. < distance < 1. else shooter.thin_wall()
+        else:
+            guess = shooter.thin_wall()
+
+        low, high = shooter.bracket(guess)
+        x = brentq(lambda x: shooter.shoot(x)[0], low, high, xtol=xtol)
+
+        # Profile up to where the shot stopped
+
+        _, r_end, kinetic, steps, (rho_exact, phi_exact) = shooter.shoot(x, record=True)
+
+        rho = np.linspace(steps[0, 0], r_end, n_points)
+        phi = _hermite(steps[:, 0], steps[:, 1], steps[:, 2], rho)
+
+        omega = 2. * np.pi**(0.5 * dim) / gamma(0.5 * dim)
+        action = 2. / dim * omega * kinetic
+
+    rho = np.concatenate((rho_exact[:-1], rho))
+    phi = np.concatenate((phi_exact[:-1], phi))
+    trajectory_data = np.column_stack((rho, phi))
+
+    return action, trajectory_data, time.time, "shooting"
+
+# Dormand-Prince tableau, for shots of many potentials at once
+
+DOPRI_C = [0., 1. / 5., 3. / 10., 4. / 5., 8. / 9., 1., 1.]
+DOPRI_A = [[],
+           [1. / 5.],
+           [3. / 40., 9. / 40.],
+           [44. / 45., -56. / 15., 32. / 9.],
+           [19372. / 6561., -25360. / 2187., 64448. / 6561., -212. / 729.],
+           [9017. / 3168., -355. / 33., 46732. / 5247., 49. / 176., -5103. / 18656.],
+           [35. / 384., 0., 500. / 1113., 125. / 192., -2187. / 6784., 11. / 84.]]
+DOPRI_E = [71. / 57600., 0., -71. / 16695., 71. / 1920., -17253. / 339200., 22. / 525., -1. / 40.]
+
+
+class Family(object):
+    """
+    Shots from the centres of bubbles in many single-field potentials of the
+    same form, differing only in their parameters, all at once.
+
+    Each method takes the indices of the potentials that it concerns, and
+    arrays of fields or positions with one row for each of them. A potential
+    that fails has a message in errors and is left alone from then on.
+    """
+    def __init__(self, potentials, dim=3, rtol=1E-7):
+        """
+        :param potentials: Potential objects with one field and a common form
+        :param dim: Number of dimensions
+        :param rtol: Relative tolerance of integrator
+        """
+        first = potentials[0]
+
+        if first.n_fields != 1:
+            raise RuntimeError("Shooting needs one field, not {}".format(first.n_fields))
+
+        if any(p.template != first.template or p._parameter_names != first._parameter_names
+               for p in potentials):
+            raise ValueError("Potentials in a family must differ only in parameters")
+
+        self.dim = dim
+        self.rtol = rtol
+        self.size = len(potentials)
+        self.errors = [None] * self.size
+        self.all = np.arange(self.size)
+        self._symbolic = first._symbolic
+        self.parameters = [np.array([p._parameter_values[i] for p in potentials])
+                           for i in range(len(first._parameter_names))]
+
+        self.true = np.array([p.true_vacuum[0] for p in potentials], dtype=float)
+        self.false = np.array([p.false_vacuum[0] for p in potentials], dtype=float)
+        self.sign = np.sign(self.false - self.true)
+        self.V_false = self.V(self.false, self.all)
+        self.fail(self.V(self.true, self.all) >= self.V_false,
+                  "True vacuum is not below false vacuum")
+
+        # Find barriers and edges, beyond which shots must undershoot
+
+        fraction = np.linspace(0., 1., N_BARRIER)
+        phi = self.true[:, np.newaxis] + np.outer(self.false - self.true, fraction)
+        V = self.V(phi, self.all) - self.V_false[:, np.newaxis]
+        top = phi[self.all, np.argmax(V, axis=1)]
+
+        above = np.argmax(V >= 0., axis=1)
+        low, high = phi[self.all, np.maximum(above - 1, 0)], phi[self.all, above]
+
+        for _ in range(MAX_BISECT):
+            middle = 0.5 * (low + high)
+            below = self.V(middle, self.all) < self.V_false
+            low, high = np.where(below, middle, low), np.where(below, high, middle)
+
+        self.edge = np.where((top - self.true) * self.sign > 0., low, top)
+
+        hessian = np.abs(self.d2V(phi, self.all))
+        self.scale = np.sqrt(np.max(hessian, axis=1))
+        self.mass = np.sqrt(np.maximum(self.d2V(self.true, self.all), 0.))
+
+        radius = np.array([_radius(p, dim) for p in potentials])
+        self.thin_wall = np.maximum(self.mass * radius, 1.)
+
+    def fail(self, which, message):
+        """
+        Record an error for some potentials, unless they already failed.
+        """
+        for i in np.flatnonzero(which):
+            if self.errors[i] is None:
+                self.errors[i] = message
+
+    @property
+    def ok(self):
+        """
+        :returns: Whether each potential is yet to fail
+        :rtype: array
+        """
+        return np.array([e is None for e in self.errors])
+
+    def _evaluate(self, function, phi, index):
+        """
+        :returns: Compiled function of the field, for the parameters of each
+        potential in index, at the fields in each row of phi
+        """
+        phi = np.asarray(phi, dtype=float)
+        shape = (len(index),) + (1,) * (phi.ndim - 1)
+        parameters = [p[index].reshape(shape) for p in self.parameters]
+        return function(phi[..., np.newaxis], np.empty(phi.shape + (1,)), parameters)[..., 0]
+
+    def V(self, phi, index):
+        """
+        :returns: Potential
+        """
+        return self._evaluate(self._symbolic.vector_potential, phi, index)
+
+    def dV(self, phi, index):
+        """
+        :returns: Derivative of potential
+        """
+        return self._evaluate(self._symbolic.vector_gradient, phi, index)
+
+    def d2V(self, phi, index):
+        """
+        :returns: Second derivative of potential
+        """
+        return self._evaluate(self._symbolic.vector_hessian, phi, index)
+
+    def centre(self, x, index):
+        """
+        :returns: Distance of field at centre of bubble from true vacuum
+        """
+        return (self.edge[index] - self.true[index]) * np.exp(-x)
+
+    def _start(self, delta, index):
+        """
+        :param delta: Distance of field at centre from true vacuum
+        :returns: Radius, field, derivative and kinetic integral at which to
+        start integrating, and the field on the way there, as in
+        Shooter._start
+
+        The radius is that at which the field has moved a small fraction of
+        the way to the edge, bracketed on a grid of powers of two.
+        """
+        true = self.true[index]
+        target = START * np.abs(self.edge[index] - true)
+        near = np.abs(delta) < target
+        mass2 = self.mass[index]**2
+
+        dV0 = np.where(near, mass2 * delta, self.dV(true + delta, index))
+        d2V0 = np.where(near, mass2, self.d2V(true + delta, index))
+
+        def still(r):
+            moved = np.abs(_exact(r, dV0[..., np.newaxis], d2V0[..., np.newaxis], self.dim)[0])
+            return moved <= target[..., np.newaxis]
+
+        # Bracket on the grid, then bisect
+
+        r = np.outer(1. / self.scale[index], 2.**np.arange(-30., 31.))
+        last = np.maximum(np.sum(np.logical_and.accumulate(still(r), axis=1), axis=1) - 1, 0)
+        rows = np.arange(len(index))
+        low, high = r[rows, last], r[rows, np.minimum(last + 1, r.shape[1] - 1)]
+
+        for _ in range(MAX_BISECT):
+            middle = 0.5 * (low + high)
+            below = still(middle[:, np.newaxis])[:, 0]
+            low, high = np.where(below, middle, low), np.where(below, high, middle)
+
+        r0 = low
+
+        rho = np.outer(r0, np.linspace(0., 1., 20))
+        change, dphi = _exact(rho, dV0[:, np.newaxis], d2V0[:, np.newaxis], self.dim)
+        phi = (true + delta)[:, np.newaxis] + change
+        kinetic = np.trapz(0.5 * dphi**2 * rho**(self.dim - 1), rho, axis=1)
+
+        return r0, phi[:, -1], dphi[:, -1], kinetic, (rho, phi)
+
+    def _rhs(self, r, y, index):
+        """
+        :returns: Derivatives of field, its derivative and kinetic integral,
+        with the gradient vanishing at and beyond the false vacuum
+        """
+        friction = self.dim - 1.
+        inside = self.sign[index] * (y[:, 0] - self.false[index]) < 0.
+        force = np.where(inside, self.dV(y[:, 0], index), 0.)
+        return np.column_stack((y[:, 1], force - friction / r * y[:, 1], 0.5 * y[:, 1]**2 * r**friction))
+
+    def shoot(self, x, index, record=False):
+        """
+        :param x: Positions of centres of bubbles
+        :param index: Potentials to shoot in
+        :param record: Whether to keep every step of the integrator
+        :returns: Energy where each shot stopped, radius at which it stopped,
+        kinetic integral there, and, if recording, the steps of each shot and
+        the fields from the linearised equation near the centres
+        :rtype: tuple
+
+        Each shot is integrated by its own adaptive Dormand-Prince steps and
+        stops by itself; all shots still going are stepped together.
+        """
+        n = len(index)
+        r0, phi, dphi, kinetic, exact = self._start(self.centre(x, index), index)
+
+        r = r0.copy()
+        y = np.column_stack((phi, dphi, kinetic))
+        h = 0.1 * np.minimum(r0, 1. / self.scale[index])
+        k1 = self._rhs(r, y, index)
+        tolerance = 1E-12 * np.abs(self.false[index] - self.true[index])
+
+        energy = np.full(n, np.nan)
+        r_end = np.full(n, np.nan)
+        T_end = np.full(n, np.nan)
+        going = np.ones(n, dtype=bool)
+        steps = [(np.arange(n), r.copy(), y.copy())] if record else None
+
+        for _ in range(MAX_STEPS):
+
+            active = np.flatnonzero(going)
+
+            if not len(active):
+                break
+
+            # One step for each shot still going
+
+            where = index[active]
+            r_a, y_a, h_a = r[active], y[active], h[active][:, np.newaxis]
+            k = [k1[active]]
+
+            with np.errstate(all="ignore"):
+
+                for c, a in zip(DOPRI_C[1:], DOPRI_A[1:]):
+                    stage = y_a + h_a * sum(a_j * k_j for a_j, k_j in zip(a, k) if a_j)
+                    k.append(self._rhs(r_a + c * h_a[:, 0], stage, where))
+
+                error = h_a * sum(e_j * k_j for e_j, k_j in zip(DOPRI_E, k) if e_j)
+                scale = tolerance[active, np.newaxis] + self.rtol * np.maximum(np.abs(y_a), np.abs(stage))
+                norm = np.sqrt(np.mean((error / scale)**2, axis=1))
+                factor = np.where(np.isfinite(norm), np.clip(0.9 * norm**-0.2, 0.2, 5.), 0.2)
+                accepted = norm <= 1.
+
+            h[active] *= factor
+            moved = active[accepted]
+
+            y_old, r_old = y[moved], r[moved]
+            y[moved] = stage[accepted]
+            r[moved] = r_a[accepted] + h_a[accepted, 0]
+            k1[moved] = k[-1][accepted]
+
+            if record:
+                steps.append((moved, r[moved].copy(), y[moved].copy()))
+
+            # Stop where field crosses false vacuum or turns back, between
+            # the last two steps
+
+            sign, false = self.sign[index[moved]], self.false[index[moved]]
+            over = sign * (y[moved, 0] - false) > 0.
+            under = sign * y[moved, 1] < 0.
+            stop = over | under
+
+            if np.any(stop):
+                a, b = y_old[stop], y[moved][stop]
+                with np.errstate(all="ignore"):
+                    w = np.where(over[stop], (false[stop] - a[:, 0]) / (b[:, 0] - a[:, 0]),
+                                 a[:, 1] / (a[:, 1] - b[:, 1]))
+                end = a + w[:, np.newaxis] * (b - a)
+                done = moved[stop]
+
+                r_end[done] = r_old[stop] + w * (r[done] - r_old[stop])
+                T_end[done] = end[:, 2]
+                energy[done] = (0.5 * end[:, 1]**2 - self.V(end[:, 0], index[done]) +
+                                self.V_false[index[done]])
+                going[done] = False
+
+                if record:
+                    steps.append((done, r_end[done], end))
+
+            broken = going & ~np.all(np.isfinite(y), axis=1)
+            self.fail(np.isin(self.all, index[broken]), "Shooting crashed: flow diverged")
+            going &= ~broken
+
+        self.fail(np.isin(self.all, index[going]), "Shooting crashed: integrator failed")
+
+        if record:
+            return energy, r_end, T_end, self._split(steps, n), exact
+
+        return energy, r_end, T_end
+
+    @staticmethod
+    def _split(steps, n):
+        """
+        :returns: Rows of radius, field, derivative and kinetic integral for
+        each shot, from steps of all shots
+
+        A stopped shot's last row is where it stopped, in place of the step
+        that went beyond.
+        """
+        which = np.concatenate([s[0] for s in steps])
+        rows = np.vstack([np.column_stack((s[1], s[2])) for s in steps])
+        order = np.argsort(which, kind="mergesort")
+        bounds = np.searchsorted(which[order], np.arange(n + 1))
+        split = [rows[order[bounds[i]:bounds[i + 1]]] for i in range(n)]
+        return [np.vstack((s[:-2], s[-1:])) if len(s) > 2 else s for s in split]
+
+    def bracket(self, x, index):
+        """
+        :param x: First guesses
+        :returns: Largest x that undershoots and smallest that overshoots,
+        NaN for potentials that failed
+        :rtype: tuple
+        """
+        low = np.full(len(index), np.nan)
+        high = np.full(len(index), np.nan)
+        todo = np.arange(len(index))
+
+        for _ in range(MAX_BRACKET):
+
+            todo = todo[self.ok[index[todo]]]
+
+            if not len(todo):
+                break
+
+            with np.errstate(invalid="ignore"):
+                over = self.shoot(x[todo], index[todo])[0] > 0.
+            high[todo[over]] = x[todo[over]]
+            low[todo[~over]] = x[todo[~over]]
+
+            todo = todo[np.isnan(low[todo]) | np.isnan(high[todo])]
+            x[todo] = np.where(np.isnan(low[todo]), 0.5 * x[todo], 2. * x[todo] + 1.)
+
+            self.fail(np.isin(self.all, index[todo[x[todo] < 1E-12]]),
+                      "Shooting crashed: overshoots from the edge")
+            self.fail(np.isin(self.all, index[todo[self.centre(x[todo], index[todo]) == 0.]]),
+                      "Shooting crashed: wall too thin to resolve")
+
+        self.fail(np.isin(self.all, index[todo]), "Shooting crashed: could not bracket bounce")
+        return low, high
+
+    def root(self, low, high, index, xtol):
+        """
+        :returns: Position of centre of bounce in each potential, found by the
+        Illinois method on all brackets at once
+        """
+        E_low = self.shoot(low, index)[0]
+        E_high = self.shoot(high, index)[0]
+        side = np.zeros(len(index))
+        todo = np.arange(len(index))
+
+        for _ in range(MAX_ROOT):
+
+            todo = todo[self.ok[index[todo]] & (high[todo] - low[todo] > xtol)]
+
+            if not len(todo):
+                break
+
+            a, b, E_a, E_b = low[todo], high[todo], E_low[todo], E_high[todo]
+
+            with np.errstate(all="ignore"):
+                x = b - E_b * (b - a) / (E_b - E_a)
+
+            inside = (x > a) & (x < b)
+            x = np.where(inside, x, 0.5 * (a + b))
+            E = self.shoot(x, index[todo])[0]
+
+            # Halve the energy at an end that is kept twice running
+
+            with np.errstate(invalid="ignore"):
+                over = E > 0.
+            up, down = todo[over], todo[~over]
+            E_low[up] *= np.where(side[up] > 0., 0.5, 1.)
+            E_high[down] *= np.where(side[down] < 0., 0.5, 1.)
+            high[up], E_high[up] = x[over], E[over]
+            low[down], E_low[down] = x[~over], E[~over]
+            side[up], side[down] = 1., -1.
+
+        self.fail(np.isin(self.all, index[todo]), "Shooting crashed: no convergence")
+        return 0.5 * (low + high)
+
+def solve_family(potentials, dim=3, rtol=1E-7, xtol=1E-10, n_points=N_POINTS, **kwargs):
+    """
+    :param potentials: Potential objects with one field and a common form,
+    e.g., from Potential.bind with different values of parameters
+    :param rtol: Relative tolerance of integrator
+    :param xtol: Tolerance for position of centre of bubble
+    :param n_points: Number of points in each trajectory
+    :returns: Action, trajectory of bounce, time taken and extra information
+    for each potential, or an error for potentials that failed
+    :rtype: list
+
+    All potentials are shot at once, so Python overhead is paid once per step
+    rather than once per potential. Each potential stops when its bounce is
+    found. The time taken is shared equally between potentials.
+
+    >>> from potential import one_dim_potential
+    >>> potential = one_dim_potential(1., 0.6)
+    >>> family = [potential.bind(alpha=a) for a in np.linspace(0.55, 0.7, 50)]
+    >>> actions = [r[0] for r in solve_family(family)]
+    """
+    potentials = list(potentials)
+
+    with clock() as time:
+
+        family = Family(potentials, dim, rtol)
+        index = family.all[family.ok]
+
+        low, high = family.bracket(family.thin_wall[index], index)
+        keep = family.ok[index]
+        index, low, high = index[keep], low[keep], high[keep]
+
+        x = family.root(low, high, index, xtol)
+        keep = family.ok[index]
+        index, x = index[keep], x[keep]
+
+        # Profiles up to where shots stopped
+
+        _, r_end, kinetic, steps, (rho_exact, phi_exact) = family.shoot(x, index, record=True)
+
+    omega = 2. * np.pi**(0.5 * dim) / gamma(0.5 * dim)
+    share = time.time / len(potentials)
+    results = [RuntimeError(e) for e in family.errors]
+
+    for i, p in enumerate(index):
+
+        if family.errors[p] is not None:
+            continue
+
+        rho = np.linspace(steps[i][0, 0], r_end[i], n_points)
+        phi = _hermite(steps[i][:, 0], steps[i][:, 1], steps[i][:, 2], rho)
+        rho = np.concatenate((rho_exact[i, :-1], rho))
+        phi = np.concatenate((phi_exact[i, :-1], phi))
+
+        action = 2. / dim * omega * kinetic[i]
+        results[p] = (action, np.column_stack((rho, phi)), share, "shooting")
+
+    return results
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -4,22 +4,33 @@ Interface to SimpleBounce
 
 You need to export SIMPLEBOUNCE=/your/path/to/SimpleBounce
 
+Each model is built once in its own directory, named by a hash of its C code,
+under $SIMPLEBOUNCE_BUILD (by default $SIMPLEBOUNCE/bubbler_models). The
+compiler and flags are taken from $CXX and $CXXFLAGS. Vacua, dimension, grid,
+initial wall and parameters of the potential are read at run time by a
+long-lived process, so a scan over them needs one build and one process.
+
 >>> ginac_potential = "0.1*((-x + 2)^4 - 14*(-x + 2)^2 + 24*(-x + 2))"
 >>> from potential import Potential
 >>> print solve(Potential(ginac_potential))
 """
 
 import os
-import numpy as np
-from subprocess32 import check_output
-from StringIO import StringIO
-
-from anybubble import curly
+from build import build
+from estimate import scales
+from process import TimedOut
+from results import read_result
+from session import session, END
 from timer import clock
 
 
+N = 100
+MAX_POINTS = 200
+
 CODE = """
-#include<iostream>
+#include <iostream>
+#include <iomanip>
+#include <vector>
 #include <cmath>
 #include "simplebounce.h"
 
@@ -28,93 +39,148 @@ using namespace simplebounce;
 
 class BubblerModel : public GenericModel {{
   public:
+	double params[{1}];
 	BubblerModel() {{
 		setNphi({0});
 	}}
 	double vpot (const double* q) const {{
-		return {1};
+		return {2};
 	}}
 	void calcDvdphi(const double *q, double *dvdq) const {{
-		{2}
+		{3}
 	}}
 }};
 
 int main() {{
 
-  // Settings from example provided with code
-	BounceCalculator bounce;
-	bounce.verboseOff();
-	bounce.setRmax(1.);
-	bounce.setN(100);
 	BubblerModel model;
-	bounce.setModel(&model);
-
-  // Contains our input
-	bounce.setDimension({3});
-	double phiTV[{0}] = {4};
-	double phiFV[{0}] = {5};
-
-	bounce.setVacuum(phiTV, phiFV);
-	bounce.solve();
-	bounce.printBounce();
-	std::cout << bounce.action();
+	int dim, n;
+	double rmax, frac, width;
+	cout << setprecision(17);
+
+  // Each line of input is a job: dimension, maximum radius, number of grid
+  // points, position and width of initial wall (or negative for defaults),
+  // true vacuum, false vacuum and parameters of potential
+
+	while (cin >> dim >> rmax >> n >> frac >> width) {{
+
+		vector<double> phiTV({0}), phiFV({0});
+		for (int i = 0; i < {0}; i++) cin >> phiTV[i];
+		for (int i = 0; i < {0}; i++) cin >> phiFV[i];
+		for (int i = 0; i < {4}; i++) cin >> model.params[i];
+
+		BounceCalculator bounce;
+		bounce.verboseOff();
+		bounce.setRmax(rmax);
+		bounce.setN(n);
+		bounce.setModel(&model);
+
+		bounce.setDimension(dim);
+		bounce.setVacuum(&phiTV[0], &phiFV[0]);
+		if (frac > 0. && width > 0.) bounce.setInitial(frac, width);
+		bounce.solve();
+		bounce.printBounce();
+		cout << bounce.action() << endl << "{5}" << endl;
+	}}
 
 	return 0;
 }}
 """
 
-def solve(potential, dim=3, **kwargs):
+def build_model(code, timeout=None):
     """
-    :returns: Action, trajectory of bounce and time taken
-    :rtype: tuple
+    :param code: C++ code for a model
+    :param timeout: Time limit in seconds for each step of the build
+    :returns: Name of executable for the model, built if not already built
     """
-    # Make extrema in C format
+    simplebounce = os.environ["SIMPLEBOUNCE"]
+    default = os.path.join(simplebounce, "bubbler_models")
+    root = os.environ.get("SIMPLEBOUNCE_BUILD", default)
 
-    true_vacuum = curly(potential.true_vacuum)
-    false_vacuum = curly(potential.false_vacuum)
+    shared = "make -C {} simplebounce.o".format(simplebounce)
+    command = "{cxx} {flags} -I{loc} -o {{executable}} {{code}} {loc}/simplebounce.o"
+    command = command.format(cxx=os.environ.get("CXX", "g++"),
+                             flags=os.environ.get("CXXFLAGS", "-O3 -std=c++11"),
+                             loc=simplebounce)
 
-    # Make C program that solves this problem
+    try:
+        return build(code, root, command, shared=shared, timeout=timeout)
+    except TimedOut:
+        raise
+    except Exception as error:
+        raise RuntimeError("SimpleBounce build crashed: {}".format(error))
 
-    code = CODE.format(potential.n_fields,
-                       potential.c_potential,
-                       potential.c_gradient,
-                       dim,
-                       true_vacuum,
-                       false_vacuum)
+def model_code(potential):
+    """
+    :returns: C++ code for a model, independent of numerical values of vacua,
+    settings and parameters
+    """
+    n_parameters = len(potential.parameter_values)
+    return CODE.format(potential.n_fields,
+                       max(n_parameters, 1),
+                       potential.c_parametric_potential,
+                       potential.c_parametric_gradient,
+                       n_parameters,
+                       END)
+
+def solve(potential, dim=3, rmax=1., n=None, hint=None, timeout=None, **kwargs):
+    """
+    :param rmax: Maximum radius
+    :param n: Number of grid points, by default enough to resolve the
+    estimated width of the wall, up to a maximum, as the cost of the flow
+    grows steeply with the grid
+    :param hint: Trajectory of a bounce for a nearby potential, from which to
+    place the initial wall, else it is placed from estimated scales
+    :param timeout: Time limit in seconds, after which the program is killed
+    and started again for the next job
+    :returns: Action, trajectory of bounce and time taken
+    :rtype: tuple
+    """
+    # Build C program, unless it was built before. Vacua, dimension, grid,
+    # initial wall and parameters of the potential are read at run time, so
+    # the whole of a scan shares a program
 
-    # Build C program
+    command = build_model(model_code(potential), timeout)
 
-    code_file = "{}/bubbler.cc".format(os.environ["SIMPLEBOUNCE"])
+    # Solve in long-lived C program
 
-    with open(code_file, "w") as f:
-        f.write(code)
+    # Initial wall is placed where the hint has its wall, relative to the
+    # size of its domain, or where the estimates put it
 
-    make = "make -C {} bubbler.x".format(os.environ["SIMPLEBOUNCE"])
+    estimated = scales(potential, dim)
 
-    try:
-        check_output(make, shell=True)
-    except Exception as error:
-        raise RuntimeError("SimpleBounce build crashed: {}".format(error))
+    if n is None:
+        n = estimated.points(high=MAX_POINTS) if estimated else N
 
-    # Execute C program
+    if hint is not None:
+        wall = [hint.radius / hint.rho_end, hint.width / hint.rho_end]
+    elif estimated:
+        wall = [estimated.size / estimated.domain, estimated.width / estimated.domain]
+    else:
+        wall = [-1., -1.]
 
-    command = "{}/bubbler.x".format(os.environ["SIMPLEBOUNCE"])
+    numbers = wall + list(potential.true_vacuum) + list(potential.false_vacuum) + \
+              list(potential.parameter_values)
+    job = "{} {!r} {} {}\n".format(int(dim), float(rmax), int(n),
+                                   " ".join(repr(float(x)) for x in numbers))
 
     with clock() as time:
         try:
-            output = check_output(command, shell=True)
+            output = session([command]).send(job, timeout)
+        except TimedOut:
+            raise
         except Exception as error:
             raise RuntimeError("SimpleBounce crashed: {}".format(error))
 
-    # Parse output
-
-    lines = output.split("\n")
-    action = float(lines[-1])
+    # Parse output in one pass; first line is a header and last column is
+    # the potential
 
-    parsed = "\n".join(lines[1:-1])
-    traj = np.genfromtxt(StringIO(parsed), dtype=float)[:, :-1]
+    try:
+        traj, numbers = read_result(output, header=1)
+    except Exception as error:
+        raise RuntimeError("SimpleBounce crashed: {}".format(error))
 
-    return action, traj, time.time, command
+    return numbers[0], traj[:, :-1], time.time, command
 
 if __name__ == "__main__":
     import doctest
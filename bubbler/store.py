@@ -0,0 +1,345 @@
+"""
+Store of scan results
+=====================
+
+Results of a scan are appended point by point to a directory of columns: raw
+binary files of the numbers of points in the scan, their parameters, and
+actions, times, ends of domains and whether time ran out for each code,
+lines of commands or errors, and the profiles of all points one after another
+with an index of where each begins. Columns are memory-mapped when read, so
+that actions and times for many points are read without reading any profiles.
+
+>>> from bubbler import bubblers, one_dim_potential
+>>> store = ScanStore("scan", backends=["cosmotransitions"], n_params=2)
+>>> for alpha in [0.6, 0.65]:
+...     store.append(bubblers(one_dim_potential(1., alpha), ["cosmotransitions"]), (1., alpha))
+>>> store.actions("cosmotransitions")
+>>> store.solutions(1)
+"""
+
+import os
+import json
+import numpy as np
+
+from trajectory import Trajectory
+
+
+META = "meta.json"
+FLOAT = np.dtype("<f8")
+INT = np.dtype("<i8")
+FLAG = np.dtype("u1")
+NUMBERS = ["action", "time", "rho_end"]
+
+
+def _number(value):
+    """
+    :returns: Float, or NaN if there isn't a number
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _column(name, dtype, width=1):
+    """
+    :returns: Memory-mapped column, or empty array if nothing was written
+    :rtype: array
+    """
+    size = os.path.getsize(name) if os.path.isfile(name) else 0
+    rows = size // (dtype.itemsize * width)
+
+    if not rows:
+        return np.empty((0, width) if width > 1 else 0, dtype=dtype)
+
+    shape = (rows, width) if width > 1 else (rows,)
+    return np.memmap(name, dtype=dtype, mode="r", shape=shape)
+
+
+class ScanStore(object):
+    """
+    Append-only, columnar store of results from a scan.
+    """
+    def __init__(self, path, backends=None, n_params=0):
+        """
+        :param path: Directory of store, made if necessary
+        :param backends: Codes in the scan, required for a new store
+        :param n_params: Number of parameters for each point
+        """
+        self.path = path
+        meta_file = os.path.join(path, META)
+
+        if os.path.isfile(meta_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+            self.backends = [str(b) for b in meta["backends"]]
+            self.n_params = meta["n_params"]
+        else:
+            if not backends:
+                raise ValueError("New store at {} needs backends".format(path))
+
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+            self.backends = list(backends)
+            self.n_params = int(n_params)
+
+            with open(meta_file, "w") as f:
+                json.dump({"backends": self.backends, "n_params": self.n_params}, f)
+
+        self._files = {}
+        self._commands = {}
+        self._repair()
+
+    def _repair(self):
+        """
+        Cut columns back to the last complete point, in case a scan stopped
+        while appending one.
+        """
+        n = len(self)
+
+        def cut(name, size):
+            if os.path.isfile(name) and os.path.getsize(name) > size:
+                with open(name, "r+b") as f:
+                    f.truncate(size)
+
+        cut(self._name("points"), n * INT.itemsize)
+        cut(self._name("params"), n * self.n_params * FLOAT.itemsize)
+
+        for backend in self.backends:
+            cut(self._name("numbers", backend), n * len(NUMBERS) * FLOAT.itemsize)
+            cut(self._name("index", backend), n * 3 * INT.itemsize)
+            cut(self._name("timed_out", backend), n * FLAG.itemsize)
+
+            index = _column(self._name("index", backend), INT, 3)
+            end = index[-1, 0] + index[-1, 1] * index[-1, 2] if len(index) else 0
+            cut(self._name("profile", backend), end * FLOAT.itemsize)
+
+            name = self._name("command", backend)
+            if os.path.isfile(name):
+                with open(name) as f:
+                    size = sum(len(line) for line, _ in zip(f, range(n)))
+                cut(name, size)
+
+    def _name(self, column, backend=None):
+        """
+        :returns: Name of file for a column
+        """
+        name = "{}.{}".format(backend, column) if backend else column
+        return os.path.join(self.path, name)
+
+    def _write(self, name, data):
+        """
+        Append bytes to a column, keeping its file open.
+        """
+        if name not in self._files:
+            self._files[name] = open(name, "ab")
+        self._files[name].write(data)
+
+    def append(self, solutions, params=(), point=None):
+        """
+        :param solutions: Results from all codes for one point
+        :type solutions: Solutions
+        :param params: Parameters of the point
+        :param point: Number of the point in its scan, by default the number
+        of points already stored
+        """
+        point = len(self) if point is None else point
+        params = np.asarray(params, dtype=FLOAT).ravel()
+
+        if params.size != self.n_params:
+            raise ValueError("Expected {} parameters, not {}".format(self.n_params, params.size))
+
+        # Profiles first, so that a point whose numbers are written is complete
+
+        for backend in self.backends:
+            solution = solutions.get(backend)
+            trajectory = solution.trajectory if solution is not None else None
+            start = self.profile_size(backend)
+
+            if trajectory is not None:
+                data = np.ascontiguousarray(trajectory.data, dtype=FLOAT)
+                self._write(self._name("profile", backend), data.tobytes())
+                index = [start, data.shape[0], data.shape[1]]
+            else:
+                index = [start, 0, 0]
+
+            self._write(self._name("index", backend), np.array(index, dtype=INT).tobytes())
+
+            timed_out = bool(getattr(solution, "timed_out", False))
+            self._write(self._name("timed_out", backend), np.array([timed_out], dtype=FLAG).tobytes())
+
+            numbers = [_number(getattr(solution, n, None)) for n in NUMBERS]
+            self._write(self._name("numbers", backend), np.array(numbers, dtype=FLOAT).tobytes())
+
+            command = getattr(solution, "command", None)
+            self._write(self._name("command", backend), json.dumps(command) + "\n")
+
+        self._write(self._name("params"), params.tobytes())
+        self._write(self._name("points"), np.array([point], dtype=INT).tobytes())
+        self.flush()
+
+    def profile_size(self, backend):
+        """
+        :returns: Number of numbers in profiles of a code
+        """
+        name = self._name("profile", backend)
+        handle = self._files.get(name)
+
+        if handle is not None:
+            return handle.tell() // FLOAT.itemsize
+
+        return os.path.getsize(name) // FLOAT.itemsize if os.path.isfile(name) else 0
+
+    def flush(self):
+        """
+        Write buffered results to disk.
+        """
+        for handle in self._files.itervalues():
+            handle.flush()
+
+    def close(self):
+        """
+        Close files of columns.
+        """
+        for handle in self._files.itervalues():
+            handle.close()
+        self._files = {}
+
+    def __enter__(self):
+        """
+        """
+        return self
+
+    def __exit__(self, *args):
+        """
+        """
+        self.close()
+
+    def __len__(self):
+        """
+        :returns: Number of complete points
+        """
+        self.flush()
+        lengths = [len(_column(self._name("numbers", b), FLOAT, len(NUMBERS)))
+                   for b in self.backends]
+
+        if self.n_params:
+            lengths.append(len(_column(self._name("params"), FLOAT, self.n_params)))
+
+        lengths.append(len(_column(self._name("points"), INT)))
+        return min(lengths)
+
+    def points(self):
+        """
+        :returns: Number of each point in its scan
+        :rtype: array
+        """
+        return _column(self._name("points"), INT)[:len(self)]
+
+    def params(self):
+        """
+        :returns: Parameters of each point
+        :rtype: array
+        """
+        if not self.n_params:
+            return np.empty((len(self), 0), dtype=FLOAT)
+
+        params = _column(self._name("params"), FLOAT, self.n_params)[:len(self)]
+        return params.reshape(-1, self.n_params)
+
+    def _numbers(self, backend, column):
+        """
+        :returns: Column of numbers from a code
+        :rtype: array
+        """
+        if backend not in self.backends:
+            raise KeyError("No results for {}".format(backend))
+
+        return _column(self._name("numbers", backend), FLOAT, len(NUMBERS))[:len(self), NUMBERS.index(column)]
+
+    def actions(self, backend):
+        """
+        :returns: Actions from a code, NaN where it failed
+        :rtype: array
+        """
+        return self._numbers(backend, "action")
+
+    def times(self, backend):
+        """
+        :returns: Times taken by a code, NaN where it failed
+        :rtype: array
+        """
+        return self._numbers(backend, "time")
+
+    def rho_ends(self, backend):
+        """
+        :returns: Ends of domains from a code, NaN where it failed
+        :rtype: array
+        """
+        return self._numbers(backend, "rho_end")
+
+    def timed_out(self, backend):
+        """
+        :returns: Whether a code ran out of time, False for points stored
+        before this was recorded
+        :rtype: array
+        """
+        n = len(self)
+        flags = _column(self._name("timed_out", backend), FLAG)[:n].astype(bool)
+        return np.concatenate((np.zeros(n - len(flags), dtype=bool), flags))
+
+    def commands(self, backend):
+        """
+        :returns: Commands from a code, or errors where it failed
+        :rtype: list
+        """
+        n = len(self)
+
+        if len(self._commands.get(backend, ())) != n:
+            with open(self._name("command", backend)) as f:
+                self._commands[backend] = [json.loads(line) for line, _ in zip(f, range(n))]
+
+        return self._commands[backend]
+
+    def trajectory(self, backend, i):
+        """
+        :param i: Index of point
+        :returns: Profile from a code at a point, read from disk
+        :rtype: Trajectory
+        """
+        self.flush()
+        start, rows, columns = _column(self._name("index", backend), INT, 3)[i]
+
+        if not rows:
+            return None
+
+        profile = _column(self._name("profile", backend), FLOAT)
+        return Trajectory(profile[start:start + rows * columns].reshape(rows, columns))
+
+    def solutions(self, i):
+        """
+        :param i: Index of point
+        :returns: Results from all codes at a point
+        :rtype: Solutions
+        """
+        from bubbler import Solution, Solutions
+
+        results = Solutions()
+
+        for backend in self.backends:
+            action, time, rho_end = _column(self._name("numbers", backend), FLOAT, len(NUMBERS))[i]
+            command = self.commands(backend)[i]
+            action = None if np.isnan(action) else action
+            results[backend] = Solution(backend,
+                                        action,
+                                        self.trajectory(backend, i),
+                                        None if np.isnan(rho_end) else rho_end,
+                                        None if np.isnan(time) else time,
+                                        command,
+                                        bool(self.timed_out(backend)[i]))
+
+        return results
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,142 @@
+"""
+Profiles of bounces
+===================
+
+A trajectory keeps rho and the fields as columns of one array, and
+interpolates all fields at once when called:
+
+>>> import numpy as np
+>>> data = np.array([[0., 1., 2.], [1., 0.5, 1.], [2., 0., 0.]])
+>>> trajectory = Trajectory(data)
+>>> trajectory([0.5, 1.5])
+array([[0.75, 1.5 ],
+       [0.25, 0.5 ]])
+
+Fields can also be taken one at a time:
+
+>>> trajectory[1](0.5)
+array(1.5)
+
+Interpolation is made when first needed and only the array is pickled.
+"""
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+
+class Trajectory(object):
+    """
+    Fields as functions of rho, sampled on a grid.
+    """
+    def __init__(self, data):
+        """
+        :param data: Rows of rho and fields
+        :type data: array
+        """
+        self.data = np.ascontiguousarray(data, dtype=float)
+        self._function = None
+
+    @property
+    def rho(self):
+        """
+        :returns: Grid of rho
+        :rtype: array
+        """
+        return self.data[:, 0]
+
+    @property
+    def fields(self):
+        """
+        :returns: Fields on grid of rho, one column per field
+        :rtype: array
+        """
+        return self.data[:, 1:]
+
+    @property
+    def n_fields(self):
+        """
+        :returns: Number of fields
+        """
+        return self.data.shape[1] - 1
+
+    @property
+    def rho_end(self):
+        """
+        :returns: Maximum value of rho
+        """
+        return self.data[-1, 0]
+
+    def _crossing(self, fraction):
+        """
+        :returns: Smallest rho at which the distance in field space from the
+        end of the bubble falls to a fraction of its value at the centre
+        """
+        distance = np.sqrt(np.sum((self.fields - self.fields[-1])**2, axis=1))
+        below = np.flatnonzero(distance <= fraction * distance[0])
+
+        if not len(below) or below[0] == 0:
+            return self.rho[-1] if not len(below) else self.rho[0]
+
+        i = below[0]
+        weight = (distance[i - 1] - fraction * distance[0]) / (distance[i - 1] - distance[i])
+        return self.rho[i - 1] + weight * (self.rho[i] - self.rho[i - 1])
+
+    @property
+    def radius(self):
+        """
+        :returns: Radius of bubble, at which fields are half-way from the
+        centre to the end
+        """
+        return self._crossing(0.5)
+
+    @property
+    def width(self):
+        """
+        :returns: Width of wall, between a quarter and three quarters of the
+        way from the centre to the end
+        """
+        return self._crossing(0.25) - self._crossing(0.75)
+
+    def __call__(self, rho):
+        """
+        :param rho: Values of rho
+        :returns: All fields at each value of rho, held at their end values
+        outside the grid
+        :rtype: array
+        """
+        if self._function is None:
+            fields = self.fields
+            self._function = interp1d(self.rho, fields, axis=0, bounds_error=False,
+                                      fill_value=(fields[0], fields[-1]))
+        return self._function(rho)
+
+    def __getitem__(self, index):
+        """
+        :param index: Index of a field
+        :returns: Function of rho for that field
+        """
+        if not -self.n_fields <= index < self.n_fields:
+            raise IndexError("No field {}".format(index))
+        return lambda rho: self(rho)[..., index]
+
+    def __len__(self):
+        """
+        :returns: Number of fields
+        """
+        return self.n_fields
+
+    def __iter__(self):
+        """
+        :returns: Functions of rho for each field
+        """
+        return (self[i] for i in range(self.n_fields))
+
+    def __reduce__(self):
+        """
+        :returns: Arguments that rebuild this trajectory from its array alone
+        """
+        return (Trajectory, (self.data,))
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,157 @@
+"""
+Scratch space for codes
+=======================
+
+Files that codes need only while solving, e.g., scripts, are made in a
+directory per solve inside a directory per worker process, and removed when
+the solve finishes. The worker directory is reused by all solves in a process
+and removed when the process exits; directories left by processes that were
+killed are removed by the next process on the same host that makes one.
+Worker directories are named by host and process, so that scratch space
+shared between nodes is safe.
+
+Scratch space is placed under $BUBBLER_SCRATCH, or /dev/shm if it exists so
+that nothing touches a disk, or the usual temporary directory otherwise.
+Export BUBBLER_KEEP_SCRATCH=1 to keep everything for debugging.
+
+>>> with scratch() as directory:
+...     print os.path.isdir(directory)
+True
+"""
+
+import os
+import errno
+import shutil
+import socket
+import tempfile
+from multiprocessing.util import Finalize
+
+
+SHM = "/dev/shm"
+PREFIX = "bubbler-"
+_WORKERS = {}
+
+
+def root():
+    """
+    :returns: Directory in which to place scratch space
+    """
+    if "BUBBLER_SCRATCH" in os.environ:
+        return os.environ["BUBBLER_SCRATCH"]
+
+    if os.path.isdir(SHM) and os.access(SHM, os.W_OK | os.X_OK):
+        return SHM
+
+    return tempfile.gettempdir()
+
+def keep():
+    """
+    :returns: Whether to keep scratch space for debugging
+    """
+    return os.environ.get("BUBBLER_KEEP_SCRATCH", "") not in ("", "0")
+
+def _prefix():
+    """
+    :returns: Start of names of worker directories on this host
+    """
+    return "{}{}-".format(PREFIX, socket.gethostname())
+
+def worker():
+    """
+    :returns: Directory for this process, made if necessary
+    """
+    pid = os.getpid()
+    directory = _WORKERS.get(pid)
+
+    if directory is None:
+        _sweep()
+        directory = os.path.join(root(), "{}{}".format(_prefix(), pid))
+
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+        _WORKERS[pid] = directory
+
+        # Finalizers run at exit of the main process and of pool workers
+
+        Finalize(None, _remove, args=(directory, pid), exitpriority=0)
+
+    return directory
+
+def _alive(pid):
+    """
+    :returns: Whether a process is running
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno != errno.ESRCH
+    return True
+
+def _sweep():
+    """
+    Remove worker directories of processes on this host that are no longer
+    running.
+    """
+    if keep():
+        return
+
+    try:
+        names = os.listdir(root())
+    except OSError:
+        return
+
+    prefix = _prefix()
+
+    for name in names:
+        if not name.startswith(prefix) or not name[len(prefix):].isdigit():
+            continue
+        if not _alive(int(name[len(prefix):])):
+            _remove(os.path.join(root(), name))
+
+def _remove(directory, pid=None):
+    """
+    Remove a directory, unless keeping scratch space or it belongs to another
+    process.
+    """
+    if keep() or (pid is not None and pid != os.getpid()):
+        return
+
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class scratch(object):
+    """
+    Directory for one solve, removed when the solve finishes.
+    """
+    def __init__(self, directory=None, keep=None):
+        """
+        :param directory: Directory chosen by the user, used and kept instead
+        :param keep: Whether to keep directory afterwards, by default from
+        $BUBBLER_KEEP_SCRATCH
+        """
+        self.directory = directory
+        self.keep = True if directory else keep
+
+    def __enter__(self):
+        """
+        :returns: Name of directory
+        """
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(dir=worker())
+        return self.directory
+
+    def __exit__(self, *args):
+        """
+        """
+        if self.keep or (self.keep is None and keep()):
+            return
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -11,21 +11,27 @@ export PYTHONPATH=/PATH/TO/CosmoTransitions:/PATH/TO/BubbleProfiler/examples/sm-
 
 import numpy as np
 
-from bubbler import bubblers, Potential
+from bubbler import bubblers, iscan, Potential, ScanStore
 from sm_plus_singlet import generate_potential
 
 
 BACKENDS = ["cosmotransitions", "bubbleprofiler", "anybubble"]
+STORE = "physical_scan"
 
 
-def physical(T, T_C, lambda_m, lambda_s, backends=None):
+def physical_potential(T, T_C, lambda_m, lambda_s):
 
     p_dict = generate_potential(T, T_C, lambda_m, lambda_s)
     tv = p_dict["true_vac"][::-1]  # Reverse them as my code likes the fields in alphabetical order!
     fv = p_dict["false_vac"][::-1]
     p = p_dict["potential_str"]
 
-    potential = Potential(p, true_vacuum=tv, false_vacuum=fv)
+    return Potential(p, true_vacuum=tv, false_vacuum=fv)
+
+
+def physical(T, T_C, lambda_m, lambda_s, backends=None):
+
+    potential = physical_potential(T, T_C, lambda_m, lambda_s)
 
     backends = BACKENDS if not backends else backends
     results = bubblers(potential, backends=backends)
@@ -43,27 +49,22 @@ if __name__ == "__main__":
 
     print physical(85., 110., 1.5,  1.76759)
 
-    # Scan in coupling and check for failures
+    # Scan in coupling and check for failures. Finished points are stored, so
+    # a scan that was stopped carries on where it left off
 
     lambda_ = np.linspace(0., 2., 100)
+    grid = [(85., 110., 1.5, l) for l in lambda_]
 
-    n_total = 0
-    n_b = 0
-    n_c = 0
-
-    for l in lambda_:
-
-        try:
-            r = physical(85., 110., 1.5, l, backends=["cosmotransitions", "bubbleprofiler"])
-        except:
-            continue
+    for i, r in iscan(physical_potential, backends=["cosmotransitions", "bubbleprofiler"],
+                      grid=grid, store=STORE):
+        print lambda_[i], r["cosmotransitions"].action, r["bubbleprofiler"].action
 
-        n_total += 1
+    # Points at which the potential could not be made count as failures
 
-        if r["bubbleprofiler"].action is not None:
-            n_b += 1
-        if r["cosmotransitions"].action is not None:
-            n_c += 1
+    store = ScanStore(STORE)
+    n_total = len(store)
+    n_b = np.isfinite(store.actions("bubbleprofiler")).sum()
+    n_c = np.isfinite(store.actions("cosmotransitions")).sum()
 
     print "cosmo", n_c, n_total
     print "us", n_b, n_total
@@ -7,7 +7,7 @@ Compare results from different codes for a one-dimensional potential
 import numpy as np
 import matplotlib.pyplot as plt
 
-from bubbler import one_dim_bubblers
+from bubbler import one_dim_bubblers, ScanStore
 
 
 RC_PARAMS = {'text.latex.preamble' : [r'\usepackage{amsmath}'],
@@ -27,8 +27,7 @@ RC_PARAMS = {'text.latex.preamble' : [r'\usepackage{amsmath}'],
              'legend.edgecolor': 'black',
              'savefig.bbox': 'tight'}
 
-ACTION = "action_ct.npy"
-TIME = "time_ct.npy"
+STORE = "quartic_ct"
 
 def analytic(alpha):
     return 4. * np.pi / (81. * (alpha - 0.5)**2)
@@ -91,29 +90,22 @@ if __name__ == "__main__":
     action_bp = data[3]
     time_bp = data[4] * 1e-3  # Convert from ms to s
 
-    try:
-        action_ct = np.load(ACTION)
-        time_ct = np.load(TIME)
-    except:
-
-        # Make CosmoTransitions results
+    # Make CosmoTransitions results, carrying on from any stored earlier
 
-        action_ct = np.zeros_like(alphas)
-        time_ct = np.zeros_like(alphas)
+    with ScanStore(STORE, backends=['cosmotransitions'], n_params=2) as store:
 
-        for i, alpha in enumerate(alphas):
+        for alpha in alphas[len(store):]:
 
             print "============================="
             print "alpha = {}".format(alpha)
             print "============================="
 
             results = one_dim_bubblers(E, alpha, backends=['cosmotransitions'])
-            action_ct[i] = results['cosmotransitions'].action
-            time_ct[i] = results['cosmotransitions'].time
+            store.append(results, (E, alpha))
 
             print results
 
-        np.save(ACTION, action_ct)
-        np.save(TIME, time_ct)
+        action_ct = store.actions('cosmotransitions')
+        time_ct = store.times('cosmotransitions')
 
     make_fig(alphas, action_ct, action_bp, time_ct, time_bp, "quartic_from_files.pdf")
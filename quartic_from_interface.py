@@ -6,34 +6,37 @@ Compare results from different codes for a one-dimensional potential
 
 import numpy as np
 
-from bubbler import one_dim_bubblers
+from bubbler import iscan, one_dim_potential, ScanStore
 from quartic_from_files import make_fig
 
 
 alphas = np.linspace(0.5, 0.75, 500, endpoint=False)
 E = 1.
+BACKENDS = ['bubbleprofiler', 'cosmotransitions']
+STORE = "quartic_from_interface"
 
 
-action_ct = []
-action_bp = []
-time_bp = []
-time_ct = []
+if __name__ == "__main__":
 
+    # Solve points not already stored by an earlier run
 
-for alpha in alphas:
+    for i, results in iscan(one_dim_potential, backends=BACKENDS,
+                            grid=[(E, alpha) for alpha in alphas], store=STORE):
 
-    print "============================="
-    print "alpha = {}".format(alpha)
-    print "============================="
+        print "============================="
+        print "alpha = {}".format(alphas[i])
+        print "============================="
 
-    results = one_dim_bubblers(E, alpha,
-                               backends=['bubbleprofiler', 'cosmotransitions'])
-    action_bp.append(results['bubbleprofiler'].action)
-    action_ct.append(results['cosmotransitions'].action)
-    time_bp.append(results['bubbleprofiler'].time)
-    time_ct.append(results['cosmotransitions'].time)
+        print results
 
-    print results
+    # Read results in order of alpha
 
+    store = ScanStore(STORE)
+    order = np.argsort(store.params()[:, 1])
 
-make_fig(alphas, action_ct, action_bp, time_ct, time_bp, "quartic_from_interface.pdf")
+    make_fig(store.params()[order, 1],
+             store.actions('cosmotransitions')[order],
+             store.actions('bubbleprofiler')[order],
+             store.times('cosmotransitions')[order],
+             store.times('bubbleprofiler')[order],
+             "quartic_from_interface.pdf")